@@ -0,0 +1,221 @@
+import threading
+import time
+import types
+from collections import namedtuple
+from gi.repository import GLib
+from history import HistoryReader, RolloverDetector
+from registermap import RegisterPlanner
+from rtu import ModbusRtuClient, IllegalRequestError
+from scheduler import PollScheduler
+from utils import logger
+
+# what the worker hands to the main loop after every cycle
+#    registers - read only {pdu_name: tuple of register values}, everything we read so far
+#    error     - None when the cycle went well, otherwise what went wrong
+#    elapsed   - seconds the cycle spent talking to the controller
+#    mode      - "full" for a normal cycle, "probe" when only probe_entry was read (see link.py)
+#    monotonic - time.monotonic() at the end of the cycle, timestamp can jump
+#    rollover  - the number of days the controller moved on since the last snapshot that went well,
+#                the history in registers is the one of the new day already
+Snapshot = namedtuple("Snapshot", ["timestamp", "registers", "error", "elapsed", "mode", "monotonic", "rollover"],
+                      defaults=(0,))
+
+
+class Device(object):
+    """
+    Everything the worker keeps for one controller (modbus slave address) on the port.
+
+    Groups with a "history" key are read with the HistoryReader instead of through their
+    entries, "today" only reads the record of the current day and "all" reads every day. The
+    "all" group is meant to be event driven, it is triggered by refresh_history(). When the
+    RolloverDetector sees the controller start a new day every day is read in the same cycle,
+    the snapshot that tells the main loop about the new day has the history of it.
+
+    mode is set from the main loop (see link.py), "full" reads whatever is due, "probe" only
+    reads probe_entry to see if the controller is back and "idle" leaves the controller alone.
+    """
+    def __init__(self, address, pdu_addresses, poll_groups, callback, history_days=30, max_gap=4, max_len=32,
+                 probe_entry="uptime"):
+        self.address = address
+        self.mode = "full"
+        self.probe_entry = probe_entry
+        self.pdu_addresses = pdu_addresses
+        self.poll_groups = poll_groups
+        self.callback = callback
+        self.scheduler = PollScheduler(poll_groups)
+        self.planner = RegisterPlanner(pdu_addresses, max_gap=max_gap, max_len=max_len)
+        self.history = HistoryReader(history_days, max_len=max_len)
+        self.rollover = RolloverDetector()
+        self.rollover_days = 0 # seen by the detector, not in a snapshot that went well yet
+        self.solar_controller = {}
+
+    def refresh_history(self):
+        """re-read every day of the history on the next cycle"""
+        for name, group in self.poll_groups.items():
+            if group.get("history") == "all":
+                self.scheduler.trigger(name)
+
+    def resync(self):
+        """read every group again on the next cycle, the once and event ones too"""
+        for name in self.poll_groups:
+            self.scheduler.trigger(name)
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    Owns the serial port and does all the modbus reads in its own thread, so a slow or dead
+    rs485 link never blocks the GLib main loop (and with it every dbus call to our service).
+
+    Several controllers can share the port (rs485 multi-drop), every one of them is a Device
+    added with add_device(). The main loop asks for a cycle with poll(), the worker then reads
+    the register groups that are due on every device (see scheduler.py). The devices take turns
+    one modbus transaction at a time, so a long history read or a controller that doesn't
+    answer doesn't starve the others. Every device gets an immutable Snapshot back on the main
+    loop through GLib.idle_add, where its callback is called with it.
+    """
+    def __init__(self, port, baud_rate=9600, max_gap=4, max_len=32):
+        threading.Thread.__init__(self, name="ms4840-" + port, daemon=True)
+        self.port = port
+        self.max_gap = max_gap
+        self.max_len = max_len
+        self.controller = ModbusRtuClient(port, baudrate=baud_rate, timeout=0.2, min_timeout=0.03, max_timeout=1.0)
+        self.devices = []
+        self._wakeup = threading.Event()
+
+    def add_device(self, address, pdu_addresses, poll_groups, callback, history_days=30, probe_entry="uptime"):
+        """add a controller on this port, do this before start()"""
+        device = Device(address, pdu_addresses, poll_groups, callback, history_days=history_days,
+                        max_gap=self.max_gap, max_len=self.max_len, probe_entry=probe_entry)
+        self.devices.append(device)
+        return device
+
+    def poll(self):
+        """
+        ask for a new cycle, never blocks. if the worker is still busy with the previous one
+        the request is remembered and a single new cycle starts right after it.
+        """
+        self._wakeup.set()
+
+    def refresh_history(self):
+        """re-read every day of the history of every device on the next cycle"""
+        for device in self.devices:
+            device.refresh_history()
+
+    def run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # the thread doesn't die with a bug in a cycle, that would leave every controller on the
+            #    port without updates for good. the next poll() starts a new cycle
+            try:
+                self._cycle()
+            except Exception:
+                logger.exception(f"cycle on {self.port} failed")
+
+    def _cycle(self):
+        # round robin, every device gets one transaction per turn until they are all done
+        turns = [(device, self._device_cycle(device)) for device in self.devices]
+        while turns:
+            for device, turn in list(turns):
+                try:
+                    next(turn)
+                except StopIteration:
+                    turns.remove((device, turn))
+                except Exception as e:
+                    # got past the error handling of the cycle, the main loop still hears about it
+                    #    (the link monitor counts it as a failed cycle) and the other devices go on
+                    logger.exception(f"cycle of controller {device.address} failed")
+                    turns.remove((device, turn))
+                    self._send(device, str(e), device.mode, time.monotonic())
+
+    def _deliver(self, device, snapshot):
+        # runs on the main loop
+        device.callback(snapshot)
+        return False # only once
+
+    def _read_block(self, device, block):
+        # the response time of the controller is learned per block (see rtu.py)
+        try:
+            values = block.split(self.controller.read_registers(device.address, block.reg, block.len, 3))
+        except IllegalRequestError:
+            # a merged read spans a register the controller doesn't want to give us
+            if len(block.members) == 1:
+                raise
+            device.planner.refuse(block)
+        else:
+            yield
+            return values
+
+        values = {}
+        for pdu_name, offset, reg_len in block.members:
+            reg = device.pdu_addresses[pdu_name]['reg']
+            values[pdu_name] = self.controller.read_registers(device.address, reg, reg_len, 3, key=block.reg)
+            yield
+        return values
+
+    def _probe(self, device):
+        entry = device.pdu_addresses[device.probe_entry]
+        device.solar_controller[device.probe_entry] = \
+            self.controller.read_registers(device.address, entry['reg'], entry['len'], 3)
+        yield
+
+    def _device_cycle(self, device):
+        """one cycle of one device, a generator that yields after every modbus transaction"""
+        mode = device.mode
+        if mode == "idle":
+            return
+        start_time = time.monotonic()
+        error = None
+        rollover = 0
+
+        # go get the data from the solar controller (mppt)
+        #    everything returns as a list
+        due = device.scheduler.due() if mode == "full" else []
+        try:
+            if mode == "probe":
+                yield from self._probe(device)
+
+            # read the entries that are due in as few blocks as possible and hand every entry its slice
+            for block in device.planner.plan(device.scheduler.entries(due)):
+                device.solar_controller.update((yield from self._read_block(device, block)))
+
+            # the stored days only change when the controller starts a new day
+            if mode == "full" and "uptime" in device.solar_controller:
+                days = device.rollover.check(device.solar_controller)
+                if days:
+                    logger.info(f"controller {device.address} started a new day, reading the history")
+                    device.rollover_days += days
+
+            history = set(device.poll_groups[name].get("history") for name in due)
+            if device.rollover_days:
+                history.add("all")
+            read_registers = lambda reg, reg_len: \
+                self.controller.read_registers(device.address, reg, reg_len, 3, key="history")
+            if "all" in history:
+                records = yield from device.history.read(read_registers)
+                for day, record in enumerate(records):
+                    device.solar_controller[str(day) + "hist"] = record
+            elif "today" in history:
+                device.solar_controller["0hist"] = yield from device.history.read_today(read_registers)
+
+        # communications error... the LinkMonitor on the main loop decides what to do about it
+        except IOError as e:
+            logger.debug(f"read_register failed (address {device.address}) error={e}")
+            error = str(e)
+        # everything else error...
+        except Exception as e:
+            logger.info(f"exception={e}")
+            error = str(e)
+        else:
+            # only once everything made it, a failed cycle reads the same groups again
+            device.scheduler.done(due)
+            rollover, device.rollover_days = device.rollover_days, 0
+
+        self._send(device, error, mode, start_time, rollover)
+
+    def _send(self, device, error, mode, start_time, rollover=0):
+        # hands the snapshot of a cycle to the main loop
+        registers = types.MappingProxyType({name: tuple(value) for name, value in device.solar_controller.items()})
+        now = time.monotonic()
+        snapshot = Snapshot(time.time(), registers, error, now - start_time, mode, now, rollover)
+        GLib.idle_add(self._deliver, device, snapshot)
@@ -22,10 +22,9 @@
 #    w/o history - DEBUG:root:spent 0.083079 in _update (max observed)
 
 import pprint
-from asyncio import exceptions
-import serial
-import minimalmodbus
 import time
+import datetime
+import functools
 import dbus
 from dbus.mainloop.glib import DBusGMainLoop
 from dbus.exceptions import (DBusException, UnknownMethodException)
@@ -34,7 +33,17 @@ import os
 import sys
 import platform
 import argparse
+import signal
+import serial
 from dbushelper import DbusHelper
+from acquisition import AcquisitionWorker
+from link import LinkMonitor
+from deadband import DeadbandFilter
+from history import decode_day, RolloverDetector
+from store import HistoryStore, overall_fields
+from series import TimeSeries, SeriesServer
+from energy import EnergyIntegrator
+import warmstart
 from utils import logger, debugging
 
 # victron packages
@@ -52,7 +61,68 @@ from settingsdevice import (  # noqa: E402
 
 # serial variables (we probably want this from a config file at some point)
 baud_rate = 9600 # ms4840 doesn't speed any faster
-controller_address = 1 # the andress of the controller
+controller_addresses = [1] # the andress of the controller, more than one if they share the rs485 bus (--address)
+max_register_gap = 4 # unused registers we are willing to read to merge two reads into one
+max_block_length = 32 # longest single read we send to the controller
+port_retry_interval = 30 # seconds until we try again to open a port that wasn't there at startup
+
+# how often the pdu entries (see MS4840.pdu_addresses) are read, in seconds
+#    "once" groups are read at startup only, the history groups are read by history.py
+#    today's history record changes all day, the others only change when the controller starts
+#    a new day so they are read at startup and then only on a day rollover (or SIGUSR1)
+#    temperatures (261) sits in the middle of the fast block (256..273), it is read with it for free, a
+#    slower period would only cost a read of its own
+poll_groups = {
+    "info": {"entries": ["sver", "hver", "system_info"], "policy": "once"},
+    "fast": {"entries": ["load_status", "current_system_voltage", "battery_power", "battery_voltage",
+                         "solar_current", "solar_power", "temperatures", "solar_voltage", "max_power_day",
+                         "power_gen_day", "alarm_info", "uptime", "total_power_generation"], "period": 1},
+    "medium": {"entries": ["battery_type"], "period": 10},
+    "history_today": {"history": "today", "period": 1},
+    "history": {"history": "all", "policy": "event"},
+}
+
+# export the paths through one fallback dbus object per service instead of a dbus object per path (and
+#    per node in between), same com.victronenergy.BusItem interface. off by default until it has seen
+#    more clients than the ones on our own GX
+dbus_fallback_export = False
+
+# at most one dbus signal every so many seconds for all the paths below each of these prefixes together,
+#    what changes in between goes out in one go at the end of the interval (see VeDbusService.set_signal_rate). the
+#    history is read every second but nobody needs it that often, /Dc/0 and the rest stay live
+signal_rates = {
+    "/History": 60,
+}
+
+# paths that only make sense while we can talk to the controller, invalidated when the link goes down
+live_paths = [
+    "/Dc/0/Voltage", "/Dc/0/Current", "/Dc/0/Temperature", "/MppTemperature",
+    "/Pv/V", "/Pv/P", "/Yield/Power", "/Yield/User", "/Yield/System",
+    "/State", "/ErrorCode",
+]
+
+# what the controller doesn't keep (the max pv voltage and max battery current of a day, the overall
+#    values) is kept in a file per service in here, see store.py. to spare the sd card it is written at
+#    most every store_flush_interval seconds, on a day rollover and when we are stopped
+store_dir = "/data/dbus-ms4840/history"
+store_days = 365
+store_flush_interval = 600
+
+# the versions, product name and history we published last are saved next to it (<port>.json, as often as
+#    the store is written) and are on the dbus the moment the service registers, instead of nothing and
+#    zeros until the controller answered. /Mgmt/Stale is 1 as long as they are from the last run
+warm_paths = ["/ProductName", "/FirmwareVersion", "/HardwareVersion"]
+
+# the recent history of the live values, in memory: 4 hours of every second, 2 weeks of minutes and
+#    2 months of quarter hours (min, max and mean of every minute/quarter), about 2.5MB per controller.
+#    series-query.py asks for it over the socket, see series.py
+series_paths = ["/Dc/0/Voltage", "/Dc/0/Current", "/Pv/V", "/Pv/P", "/Dc/0/Temperature", "/MppTemperature"]
+series_tiers = [(1, 4 * 3600), (60, 14 * 1440), (900, 60 * 96)]
+series_socket = "/var/tmp/dbus-ms4840_{}.sock"
+
+# the energy of the day is integrated from the polled power as well (see energy.py), samples further
+#    apart than this many seconds leave a gap instead of a straight line
+energy_max_gap = 10
 
 # general variables
 softwareversion = '0.8'
@@ -62,50 +132,93 @@ hardwareversion = '00.00'
 firmwareversion = '00.00'
 connection = 'USB'
 servicename = 'com.victronenergy.solarcharger.tty'
-deviceinstance = 290    #VRM instanze
-exceptionCounter = 0
+deviceinstance = 290    #VRM instanze, the next controllers on the bus get 291, 292...
 history_days = 30 # number of days to get history for, if available
+history_days_served = 365 # /History/Daily/0 up to here, the days the controller doesn't have come from the store (up to store_days)
+history_days_margin = 30 # the store's days past the controller's that are paths of their own, the older ones are read from the store when asked for
+history_days_per_cycle = 10 # days looked up in the store per cycle, so how much of it there is doesn't hold up the startup
 total_trackers = 1 # number of mppt devices
 
 # formatting
-def _a(p, v):
-    return str("%.1f" % v) + "A"
+#    the same few values come by over and over (and every GetItems asks for the text of every path),
+#    so every formatter remembers the text of the last values it rendered
+def _cached(render):
+    @functools.lru_cache(maxsize=128)
+    def _render(kind, v):
+        return render(v)
+
+    def formatter(p, v):
+        # the type is part of the key, 1, 1.0 and True are the same key otherwise
+        return _render(type(v), v)
+    return formatter
+
+
+@_cached
+def _a(v):
+    return "%.1fA" % v
+
+
+@_cached
+def _n(v):
+    return "%i" % v
 
 
-def _n(p, v):
-    return str("%i" % v)
+@_cached
+def _s(v):
+    return "%s" % v
 
 
-def _s(p, v):
-    return str("%s" % v)
+@_cached
+def _v(v):
+    return "%.2fV" % v
 
 
-def _v(p, v):
-    return str("%.2f" % v) + "V"
+@_cached
+def _w(v):
+    return "%iW" % v
 
 
-def _w(p, v):
-    return str("%i" % v) + "W"
+@_cached
+def _kwh(v):
+    return "%ikWh" % v
 
 
-def _kwh(p, v):
-    return str("%i" % v) + "kWh"
+@_cached
+def _wh(v):
+    return "%iWh" % v
 
-def _wh(p, v):
-    return str("%i" % v) + "Wh"
 
-def _C(p, v):
-    return str("%i" % v) + "°C"
+@_cached
+def _wh1(v):
+    return "%.1fWh" % v
 
+
+@_cached
+def _C(v):
+    return "%i°C" % v
+
+
+# paths that always hold the same type declare it (valuetype), a SetValue from another process is cast to
+#    it. the float ones also go straight into a dbus.Double without finding out what they are first (see
+#    ve_utils.dbus_value_wrapper)
+# paths that jitter every second can have a deadband (absolute, in the unit of the path), a
+#    deadband_rel (fraction of the last published value) and a heartbeat (seconds), see deadband.py
 solar_charger_dict = {
     # general data
     "/NrOfTrackers": {"value": None, "textformat": _n},
-    "/Pv/V": {"value": None, "textformat": _v},
-    "/Pv/P": {"value": None, "textformat": _w},
+    "/Pv/V": {"value": None, "textformat": _v, "valuetype": float, "deadband_rel": 0.01, "heartbeat": 60},
+    "/Pv/P": {"value": None, "textformat": _w, "valuetype": int, "deadband": 2, "deadband_rel": 0.02, "heartbeat": 60},
     "/Pv/Name": {"value": None, "textformat": _s},
-    "/Yield/Power": {"value": None, "textformat": _w},
-    "/Yield/User": {"value": None, "textformat": _wh},
-    "/Yield/System": {"value": None, "textformat": _wh},
+    "/Yield/Power": {"value": None, "textformat": _w, "valuetype": int, "deadband": 2, "deadband_rel": 0.02, "heartbeat": 60},
+    "/Yield/User": {"value": None, "textformat": _wh, "valuetype": int},
+    "/Yield/System": {"value": None, "textformat": _wh, "valuetype": int},
+    # not victron paths, the energy of the controller's day integrated from the polled pv power and battery
+    #    voltage x current since it started (or since we started), and how far the integrated pv energy
+    #    is from what power_gen_day went up by in that time. Gap is the seconds that weren't integrated
+    "/Integrated/Yield": {"value": None, "textformat": _wh1, "valuetype": float},
+    "/Integrated/BatteryCharge": {"value": None, "textformat": _wh1, "valuetype": float},
+    "/Integrated/YieldDeviation": {"value": None, "textformat": _wh1, "valuetype": float},
+    "/Integrated/Gap": {"value": None, "textformat": _n, "valuetype": int},
 
     # if you have more than one mppt controller...
     #"/Pv/0/V": {"value": None, "textformat": _v},
@@ -131,16 +244,16 @@ solar_charger_dict = {
     "/Settings/BmsPresent": {"value": None, "textformat": _n},
     "/Settings/ChargeCurrentLimit": {"value": None, "textformat": _n},
     # other paths
-    "/Dc/0/Voltage": {"value": None, "textformat": _v},
-    "/Dc/0/Current": {"value": None, "textformat": _a},
-    "/Dc/0/Temperature": {"value": None, "textformat": _C},
-    "/MppTemperature": {"value": None, "textformat": _C},
+    "/Dc/0/Voltage": {"value": None, "textformat": _v, "valuetype": float},
+    "/Dc/0/Current": {"value": None, "textformat": _a, "valuetype": float, "deadband": 0.05, "heartbeat": 60},
+    "/Dc/0/Temperature": {"value": None, "textformat": _C, "valuetype": int},
+    "/MppTemperature": {"value": None, "textformat": _C, "valuetype": int},
     # the ms4840-n doesn't have capability to offer load
     "/Load/State": {"value": None, "textformat": _n},
     "/Load/I": {"value": None, "textformat": _a},
     # errors/state/operating mode/relay
-    "/ErrorCode": {"value": 0, "textformat": _n},
-    "/State": {"value": 0, "textformat": _n},
+    "/ErrorCode": {"value": 0, "textformat": _n, "valuetype": int},
+    "/State": {"value": 0, "textformat": _n, "valuetype": int},
     "/Mode": {"value": None, "textformat": _n},
     "/MppOperationMode": {"value": None, "textformat": _n},
     "/DeviceOffReason": {"value": None, "textformat": _s},
@@ -152,61 +265,49 @@ solar_charger_dict = {
     "/Alarms/ShortCircuit": {"value": None, "textformat": _n},
     # history (daily is created dynamically below)
     "/History/Overall/DaysAvailable": {"value": history_days, "textformat": _n},
-    "/History/Overall/MaxPvVoltage": {"value": 0.0, "textformat": _v},
-    "/History/Overall/MaxBatteryVoltage": {"value": 0, "textformat": _v},
-    "/History/Overall/MinBatteryVoltage": {"value": 0, "textformat": _v},
+    "/History/Overall/MaxPvVoltage": {"value": 0.0, "textformat": _v, "valuetype": float},
+    "/History/Overall/MaxBatteryVoltage": {"value": 0, "textformat": _v, "valuetype": float},
+    "/History/Overall/MinBatteryVoltage": {"value": 0, "textformat": _v, "valuetype": float},
     "/History/Overall/LastError1": {"value": None, "textformat": _n},
     "/History/Overall/LastError2": {"value": None, "textformat": _n},
     "/History/Overall/LastError3": {"value": None, "textformat": _n},
     "/History/Overall/LastError4": {"value": None, "textformat": _n},
 }
 
-# add in history paths to the dictionary
-for day in range(history_days):
-    solar_charger_dict.update(
-        {
-            "/History/Daily/" + str(day) + "/Yield": {"value": 0, "textformat": _wh},
-            "/History/Daily/" + str(day) + "/MaxPower": {"value": 0, "textformat": _kwh},
-            "/History/Daily/" + str(day) + "/MinVoltage": {"value": 0, "textformat": _v},
-            # this isn't used?
-            #"/History/Daily/" + str(day) + "/MaxVoltage": {"value": None, "textformat": _v},
-            "/History/Daily/" + str(day) + "/MaxPvVoltage": {"value": 0, "textformat": _v},
-            "/History/Daily/" + str(day) + "/MinBatteryVoltage": {"value": 0, "textformat": _v},
-            "/History/Daily/" + str(day) + "/MaxBatteryVoltage": {"value": 0, "textformat": _v},
-            "/History/Daily/" + str(day) + "/MaxBatteryCurrent": {"value": 0, "textformat": _a}
-        }
-    )
-
-# we need to know what serialport / usb to connect to and we expect that from the command line
-#   as argument 1.
-if len(sys.argv) > 1:
-    controller_path = sys.argv[1] # /dev/ttyUSB1
-    controller_suffix = sys.argv[1].split('/')[2] # ttyUSB
-    controller = minimalmodbus.Instrument(controller_path, controller_address)
-    servicename = 'com.victronenergy.solarcharger.' + controller_suffix
-else:
-    logger.info(f"no port given. bye.")
-    sys.exit()
-
-controller.serial.baudrate = baud_rate
-controller.serial.bytesize = 8
-controller.serial.parity = serial.PARITY_NONE
-controller.serial.stopbits = 1
-controller.serial.timeout = 0.2
-controller.mode = minimalmodbus.MODE_RTU
-controller.clear_buffers_before_each_transaction = True
-#controller.close_port_afer_each_call = True
-
-logger.info("")
-logger.info("Starting dbus-ms4840")
+# the paths of one day of history, /History/Daily/<day>/<name>. they aren't in solar_charger_dict,
+#    the days are added as the controller has them (see MS4840._register_history)
+history_day_dict = {
+    "Yield": {"value": 0, "textformat": _wh, "valuetype": float},
+    "MaxPower": {"value": 0, "textformat": _kwh, "valuetype": int},
+    # MinVoltage and MaxVoltage aren't used, nothing writes them
+    "MaxPvVoltage": {"value": 0, "textformat": _v, "valuetype": float},
+    "MinBatteryVoltage": {"value": 0, "textformat": _v, "valuetype": float},
+    "MaxBatteryVoltage": {"value": 0, "textformat": _v, "valuetype": float},
+    "MaxBatteryCurrent": {"value": 0, "textformat": _a, "valuetype": float},
+}
+
+def _history_value(name, values):
+    # the value of a history path from a day of the store (None if it doesn't have the day)
+    value = values.get(name) if values else None
+    settings = history_day_dict[name]
+    return settings["value"] if value is None else settings["valuetype"](value)
+
 
 class MS4840(object):
-    def __init__(self, paths):
+    def __init__(self, paths, worker, address, servicename, deviceinstance):
         print(f"trying to register '{servicename}' on the dbus")
-        res = self._dbusservice = VeDbusService(servicename, register=False)
+        start_time = time.monotonic()
+        # every controller gets its own connection, the object paths of the services would clash otherwise
+        res = self._dbusservice = VeDbusService(servicename, bus=_dbusconnection(), register=False,
+                                                fallback=dbus_fallback_export)
 
         self._paths = paths
         self.got_history = False
+        self.history_days_registered = 0 # /History/Daily/0 up to here are on the dbus
+        self.controller_days = 0 # the first days of those come from the controller, the rest from the store
+        self.store_days_checked = 0 # the days below this were looked up in the store
+        self.store_days_found = 0 # and the last one it had, plus one
+        self.rollover_days = 0 # the controller started a new day, not published yet (see acquisition.py)
         self.loop_index = 0
         self.solar_controller = {}
         self.solar_controller_history = {}
@@ -228,19 +329,39 @@ class MS4840(object):
             "alarm_info": {"reg": 270, "len": 1}, # 0x010Eh
             "battery_type": {"reg": 515, "len": 1}, # 0x0202h
             "uptime": {"reg": 271, "len": 1}, # 0x010fh
-            "total_power_generation": {"reg": 272, "len": 2}, # 0x0110-0x0111h, also total yield?
-            "0dhist": {"reg": 1024, "len": 5}, # 0x0400h
-            "1dhist": {"reg": 1025, "len": 5} # 0x0400h
+            "total_power_generation": {"reg": 272, "len": 2}, # 0x0110-0x0111h, also total yield? high word first
         }
 
-        # create the history pdu_address entries
-        for day in range(history_days):
-            pdu_name = str(day) + "hist"
-            reg = (1024 + int(day))
-            self.pdu_addresses.update(
-            {
-                pdu_name: {"reg": reg, "len": 5},
-            })
+        # the serial port is owned by the acquisition worker, it reads the entries above (and the
+        #    daily history) in its own thread and hands us the results in _publish
+        self.device = worker.add_device(address, self.pdu_addresses, poll_groups, self._publish,
+                                        history_days=history_days)
+
+        # keeps track of the link to the controller and backs off while it doesn't answer
+        self.link = LinkMonitor(self.device, self._connection_changed)
+
+        # holds back the values that only jitter, see the deadband keys in solar_charger_dict
+        self.deadband = DeadbandFilter(paths)
+
+        # the local history, /History/Daily/<day> is the date of the controller's day 0 minus day
+        self.store = _open_store(servicename)
+        if self.store is not None:
+            self._dbusservice.add_tree_handler('/History/Daily', self._stored_value, self._stored_text)
+
+        # what we published last time, see warm_paths
+        self.warm_path = _data_path(servicename, ".json")
+        self.warm = self._warm_start()
+        self.warm_saved = None # the state in the file
+        self.warm_time = time.monotonic()
+        self.warm_due = False
+
+        # the live values of the last hours/weeks, see series_tiers
+        self.series = TimeSeries(series_paths, series_tiers)
+
+        # the energy of the day, from the samples (see energy.py)
+        self.pv_energy = EnergyIntegrator(energy_max_gap)
+        self.battery_energy = EnergyIntegrator(energy_max_gap)
+        self.yield_base = None # power_gen_day when the integration started
 
         logger.debug("%s /DeviceInstance = %d" % (servicename, deviceinstance))
 
@@ -248,46 +369,193 @@ class MS4840(object):
         self._dbusservice.add_path('/Mgmt/ProcessName', __file__)
         self._dbusservice.add_path('/Mgmt/ProcessVersion', softwareversion)
         self._dbusservice.add_path('/Mgmt/Connection', connection)
+        self._dbusservice.add_path('/Mgmt/Stale', 1 if self.warm else 0)
 
         # Create the mandatory objects
         self._dbusservice.add_path('/DeviceInstance', deviceinstance)
         self._dbusservice.add_path('/ProductId', 1)
-        self._dbusservice.add_path('/ProductName', productname)
-        self._dbusservice.add_path('/FirmwareVersion', firmwareversion)
-        self._dbusservice.add_path('/HardwareVersion', hardwareversion)
+        self._dbusservice.add_path('/ProductName', self.warm.get('/ProductName', productname))
+        self._dbusservice.add_path('/FirmwareVersion', self.warm.get('/FirmwareVersion', firmwareversion))
+        self._dbusservice.add_path('/HardwareVersion', self.warm.get('/HardwareVersion', hardwareversion))
         self._dbusservice.add_path('/Connected', 1)
         self._dbusservice.add_path('/Serial', serialnumber)
         self._dbusservice.add_path('/CustomName', '', writeable=True)
 
         for path, settings in self._paths.items():
-            self._dbusservice.add_path(
-                path,
-                settings["value"],
-                gettextcallback=settings["textformat"],
-                writeable=True,
-                onchangecallback=self._handlechangedvalue,
-            )
+            self._add_path(self._dbusservice, path, settings)
+
+        # and the days of history we had last time
+        days = 0
+        while f"/History/Daily/{days}/Yield" in self.warm:
+            days += 1
+        for day in range(days):
+            for name, settings in history_day_dict.items():
+                self._add_path(self._dbusservice, f"/History/Daily/{day}/{name}", settings)
+        self.history_days_registered = self.controller_days = days
+
+        for prefix, interval in signal_rates.items():
+            self._dbusservice.set_signal_rate(prefix, interval)
 
         # register VeDbusService after all paths where added
         self._dbusservice.register()
+        logger.info(f"{servicename} registered with {len(self._dbusservice._dbusobjects)} paths in "
+                    f"{time.monotonic() - start_time:.3f}s")
 
         # setup default values for various paths
         self._dbusservice['/NrOfTrackers'] = total_trackers
         self._dbusservice['/Load/State'] = 0 # on the ms4840n this is always 0 since there is no load capability
         self._dbusservice['/Load/I'] = 0 # on the ms4840n this is always 0 since there is no load capability
 
-        # register the update function for the dbus paths every second
-        GLib.timeout_add(1000, self._update)
-
     def _update_once(self):
         pass
 
+    def _add_path(self, service, path, settings):
+        service.add_path(
+            path,
+            self.warm.get(path, settings["value"]),
+            gettextcallback=settings["textformat"],
+            valuetype=settings.get("valuetype"),
+            writeable=True,
+            onchangecallback=self._handlechangedvalue,
+        )
+
+    def _register_history(self, s, days):
+        # a controller only has as many days of history as it has been running (uptime), so the days are
+        #    added as it gets them instead of all history_days up front. they are added in the batch of the
+        #    cycle, every new path goes out in its ItemsChanged signal
+        self.controller_days = min(max(days, 1), history_days)
+
+        # the days before those go as far back as the store has them. it is looked through a few days
+        #    every cycle, so a long history doesn't make the startup any slower, the older days just show
+        #    up over the first cycles. days the store skipped (driver not running) are left at 0
+        if self.store is not None:
+            last = min(history_days_served, self.store.days)
+            first = max(self.store_days_checked, self.controller_days)
+            for day in range(first, min(first + history_days_per_cycle, last)):
+                if self.store.day(self.day0 - datetime.timedelta(days=day)) is not None:
+                    self.store_days_found = day + 1
+            self.store_days_checked = max(self.store_days_checked, min(first + history_days_per_cycle, last))
+
+        # only the first of those are paths, every path is an object on the dbus and a year of them is
+        #    thousands. the rest is read from the store when a client asks for it, see _stored_value
+        days = min(max(self.controller_days, self.store_days_found), self.controller_days + history_days_margin)
+        if days <= self.history_days_registered:
+            return
+        for day in range(self.history_days_registered, days):
+            for name, settings in history_day_dict.items():
+                self._add_path(s, f"/History/Daily/{day}/{name}", settings)
+            self._restore_day(s, day)
+        logger.debug(f"added /History/Daily/{self.history_days_registered} up to {days - 1}")
+        self.history_days_registered = days
+
+    def _restore_day(self, s, day):
+        # the values the controller doesn't have come from the store, the rest is overwritten by the
+        #    controller's own history on the next cycle anyway. the days it doesn't have at all come
+        #    from the store as a whole
+        values = self.store.day(self.day0 - datetime.timedelta(days=day)) if self.store is not None else None
+        names = ("MaxPvVoltage", "MaxBatteryCurrent") if day < self.controller_days else history_day_dict
+        for name in names:
+            s[f"/History/Daily/{day}/{name}"] = _history_value(name, values)
+
+    def _stored_value(self, path):
+        # /History/Daily/<day>/<name> of the days past the registered ones, the tree handler of the
+        #    service asks for them. a day the store skipped is 0 like the registered ones, a path past
+        #    the last day it has doesn't exist
+        try:
+            _, _, _, day, name = path.split('/')
+            day = int(day)
+        except ValueError:
+            return None
+        if name not in history_day_dict or not self.history_days_registered <= day < min(history_days_served, self.store.days):
+            return None
+        values = self.store.day(self.day0 - datetime.timedelta(days=day))
+        if values is None and day >= self.store_days_found:
+            return None
+        return _history_value(name, values)
+
+    def _stored_text(self, path, value):
+        return history_day_dict[path.rsplit('/', 1)[1]]["textformat"](path, value)
+
+    def _store_history(self, s):
+        if self.store is None:
+            return
+        # only the controller's days change, the older ones came from the store
+        for day in range(min(self.controller_days, self.history_days_registered)):
+            self.store.set_day(self.day0 - datetime.timedelta(days=day),
+                               {name: s[f"/History/Daily/{day}/{name}"] for name in history_day_dict})
+        self.store.set_overall({name: s[f"/History/Overall/{name}"] or None
+                                for name in overall_fields})
+        self.store.flush()
+        self._save_warm_start()
+
+    def _warm_start(self):
+        state = warmstart.load(self.warm_path)
+        values = state.get("values")
+        if not isinstance(values, dict):
+            values = {}
+
+        # the date of the controller's day 0. the controller starts its day at dawn and not at midnight,
+        #    so it is kept from the last run and only moved on when the controller starts a new day (the
+        #    rollover detector of the worker starts where it was, a new day while we were stopped counts
+        #    as well). only without a state it is today, a first start between midnight and dawn is a day
+        #    off until the next rollover
+        today = datetime.date.today()
+        try:
+            self.day0 = min(datetime.date.fromisoformat(state["day0"]), today)
+            rollover = {name: state["rollover"][name] for name in ("uptime", "power_gen_day")}
+            if not all(value is None or type(value) is int for value in rollover.values()):
+                raise ValueError(f"rollover {rollover}")
+        except (KeyError, TypeError, ValueError):
+            self.day0 = today
+            rollover = {"uptime": None, "power_gen_day": None}
+            values = {path: value for path, value in values.items() if not path.startswith("/History/Daily/")}
+        self.device.rollover = RolloverDetector(**rollover)
+        self.rollover_state = rollover
+        if self.day0 < today - datetime.timedelta(days=1):
+            # a restart overnight still has yesterday's day 0, anything older surely isn't current anymore
+            values = {path: value for path, value in values.items() if not path.startswith("/History/Daily/")}
+        # the overall values of the store are as new and survive a lost json file
+        if self.store is not None:
+            for name, value in self.store.overall().items():
+                if value is not None:
+                    values[f"/History/Overall/{name}"] = value
+        return values
+
+    def _save_warm_start(self, force=False):
+        now = time.monotonic()
+        if not (force or self.warm_due or now - self.warm_time >= store_flush_interval):
+            return
+        paths = warm_paths + [path for path in self._paths if path.startswith("/History/Overall/")]
+        paths += [f"/History/Daily/{day}/{name}" for day in range(self.controller_days) for name in history_day_dict]
+        state = {"day0": self.day0.isoformat(),
+                 "rollover": self.rollover_state,
+                 "values": {path: self._dbusservice[path] for path in paths}}
+        # nothing changes all night, don't wear out the sd card writing the same thing
+        if state != self.warm_saved and warmstart.save(self.warm_path, state):
+            self.warm_saved = state
+        self.warm_time = now
+        self.warm_due = False
+
+    def close(self):
+        if not self.warm:
+            self._save_warm_start(force=True)
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def _connection_changed(self, connected):
+        with self.deadband.batch(self._dbusservice) as s:
+            s['/Connected'] = 1 if connected else 0
+            if not connected:
+                # don't leave the last values standing as if they were current
+                for path in live_paths:
+                    s[path] = None
+
     def _handlechangedvalue(self, path, value):
         logger.debug("someone else updated %s to %s" % (path, value))
         return True  # accept the change
 
-    def _update(self):
-        global exceptionCounter
+    def _publish(self, snapshot):
         start_time = time.process_time()
 
         def _convert_to_string(data):
@@ -328,160 +596,200 @@ class MS4840(object):
             else: # shouldn't get here
                 return 3 # default to equalizing charge?
 
-        # go get the data from the solar controller (mppt)
-        #    everything returns as a list
-        try:
-            for pdu_address in self.pdu_addresses:
-                pdu_name = pdu_address
-                reg = self.pdu_addresses[pdu_address]['reg']
-                reg_len = self.pdu_addresses[pdu_address]['len']
-
-                # only process certain paths on loop_index 0 to save communication time
-                # TODO
-                #    - really only get this on startup
-                if self.loop_index != 0 and "ver" in pdu_name:
-                    continue
-                if self.loop_index != 0 and "system_info" in pdu_name:
-                    continue
-
-                # only get the history records every 30 seconds to reduce traffic since they won't change as fast
-                if ((self.loop_index % 30) != 0 and "hist" in pdu_name):
-                    continue
-
-                #print(f"trying to read reg: {reg} - name: {pdu_name}")
-                pdu_value = controller.read_registers(reg, reg_len, 3)
-                self.solar_controller[pdu_name] = pdu_value
-        # communications error...
-        except IOError as e:
-            logger.info(f"read_register failed")
-            logger.info(f"error={e}")
-        # everything else error...
-        except:
-            logger.info(f"exception={exceptions}")
-            exceptionCounter +=1
-            if exceptionCounter  >= 3:
-                #print(f"sleeping for 3")
-                exceptionCounter = 0
-                time.sleep(3)
-        # all seems to have gone well, let's process the data
-        else:
-            logger.debug(self.solar_controller)
-            exceptionCounter = 0
-            self._dbusservice['/ProductName'] = _convert_to_string(self.solar_controller['system_info'])
-            # these are just converted to integers and divided by 100 (for now)
-            self._dbusservice['/FirmwareVersion'] = (self.solar_controller['sver'][0] / 100)
-            self._dbusservice['/HardwareVersion'] = (self.solar_controller['hver'][0] / 100)
-
-            self._dbusservice['/Dc/0/Voltage'] = (self.solar_controller["battery_voltage"][0] / 10 )
-            self._dbusservice['/Dc/0/Current'] = (self.solar_controller["solar_current"][0] * 0.01)
-            self._dbusservice['/Dc/0/Temperature'] = (self.solar_controller["temperatures"][0] >> 0 & 0xff) # <-- lower 8 bits
-            self._dbusservice['/MppTemperature'] = (self.solar_controller["temperatures"][0] >> 8 & 0xff) # <-- lower 8 bits
-
-            self._dbusservice['/Pv/V'] = (self.solar_controller["solar_voltage"][0] / 10)
-            self._dbusservice['/Pv/P'] = (self.solar_controller["solar_power"][0])
-            self._dbusservice['/Yield/Power'] = (self.solar_controller["solar_power"][0]) # in Wh (System yield in GUI)
-            self._dbusservice['/Yield/User'] = (self.solar_controller["power_gen_day"][0]) # in Wh (Total yield in GUI)
-
-            self._dbusservice['/History/Overall/DaysAvailable'] = (self.solar_controller["uptime"][0])
-            self._dbusservice['/History/Daily/0/Yield'] = (self.solar_controller["power_gen_day"][0] / 1000) # in watts
-            self._dbusservice['/History/Daily/0/MaxPower'] = (self.solar_controller["max_power_day"][0]) # in watts
-
-            # state is the current method the battery is being charged (bulk, absortion, float)
-            state = _calculate_state(self.solar_controller["load_status"][0],\
-                                     self.solar_controller["solar_current"][0] * 0.01,\
-                                     self.solar_controller["battery_voltage"][0] / 10)
-            self._dbusservice['/State'] = state
-
-            # it costs us very little to update the same variables in memory (this isn't low latency programming)
-            # 0dhist': [115, 0, 248, 145, 131] charge Wh/today, load today, max power gen todat (watt), max battery, min battery
-            for day in range(int(history_days)):
-                history_key = str(day) + "hist"
-
-                # this are all stored on device
-                self._dbusservice[f"/History/Daily/{day}/Yield"] = (self.solar_controller[history_key][0] / 1000) # labeled as kWh in GUI, ms4840 reports WH
-                self._dbusservice[f"/History/Daily/{day}/MaxPower"] = (self.solar_controller[history_key][2])
-                self._dbusservice[f"/History/Daily/{day}/MaxBatteryVoltage"] = ((self.solar_controller[history_key][3]) / 10)
-                self._dbusservice[f"/History/Daily/{day}/MinBatteryVoltage"] = ((self.solar_controller[history_key][4]) / 10)
-
-            # if we have a new maximum battery current, reflect it today - this is not stored on the ms4840n
-            if self._dbusservice['/Dc/0/Current'] > self._dbusservice['/History/Daily/0/MaxBatteryCurrent']:
-                self._dbusservice['/History/Daily/0/MaxBatteryCurrent'] = self._dbusservice['/Dc/0/Current']
-
-            # if we have a new maximum solar voltage, reflect it today - this is not stored on the ms4840n
-            if self._dbusservice['/Pv/V'] > self._dbusservice['/History/Daily/0/MaxPvVoltage']:
-                self._dbusservice['/History/Daily/0/MaxPvVoltage'] = self._dbusservice['/Pv/V']
-
-            # do we have a new min/max overall battery voltage
-            if self._dbusservice['/Dc/0/Voltage'] > self._dbusservice['/History/Overall/MaxBatteryVoltage']:
-                self._dbusservice['/History/Overall/MaxBatteryVoltage'] = self._dbusservice['/Dc/0/Voltage']
-            if self._dbusservice['/Dc/0/Voltage'] < self._dbusservice['/History/Overall/MinBatteryVoltage']:
-                self._dbusservice['/History/Overall/MinBatteryVoltage'] = self._dbusservice['/Dc/0/Voltage']
-
-            # do we have a new overall solar voltage - this is not storage on the ms4840n
-            if self._dbusservice['/Pv/V'] > self._dbusservice['/History/Overall/MaxPvVoltage']:
-                self._dbusservice['/History/Overall/MaxPvVoltage'] = self._dbusservice['/Pv/V']
-
-            # total power generation all time in WH
-            self._dbusservice['/Yield/System'] = (self.solar_controller['total_power_generation'][1])
-            # any errors - https://www.victronenergy.com/live/mppt-error-codes
-            if self.solar_controller["alarm_info"][0] == 0: # no error
-                self._dbusservice['/ErrorCode'] = 0 # no error
-            elif self.solar_controller["alarm_info"][0] == 1: # battery over discharged
-                logger.info("battery is over discharged")
-                self._dbusservice['/ErrorCode'] = 0 # no error - victron doens't have this error
-            elif self.solar_controller["alarm_info"][0] == 2: # battery over voltage
-                logger.info("battery voltage is low")
-                self._dbusservice['/ErrorCode'] = 2 # battery voltage too high
-            elif self.solar_controller["alarm_info"][0] == 3: # load short circuit
-                logger.info("load short circuit - check rs484/temp cables")
-                self._dbusservice['/ErrorCode'] = 8 # battery voltage sense disconnected
-            elif self.solar_controller["alarm_info"][0] == 4: # load power too big or load open circuit
-                logger.info("load power too big or load open circuit")
-                self._dbusservice['/ErrorCode'] = 18 # controller over-current
-            elif self.solar_controller["alarm_info"][0] == 5: # controller temperature too high
-                logger.info("solar controller temerature is too high")
-                self._dbusservice['/ErrorCode'] = 22 # controller over-current
-            elif self.solar_controller["alarm_info"][0] == 6: # surrounding temperature too high
-                logger.info("surrounding temperature is too high")
-                self._dbusservice['/ErrorCode'] = 1 # battery temperature too high
-            elif self.solar_controller["alarm_info"][0] == 7: # input power too big (too high)
-                logger.info("input power too big")
-                self._dbusservice['/ErrorCode'] = 35 # pv over-power
-            elif self.solar_controller["alarm_info"][0] == 8: # input side short circuit
-                logger.info("input side short circuit")
-                self._dbusservice['/ErrorCode'] = 27 # charger short circuit
-            elif self.solar_controller["alarm_info"][0] == 9: # solar panel input over voltage
-                logger.info(f"solar panel input is over voltage {self._dbusservice['/Pv/V']}")
-                self._dbusservice['/ErrorCode'] = 33
-            elif self.solar_controller["alarm_info"][0] == 12: # solar panel reverse connectivity ('doh!)
-                logger.info("solar panel polarity is reversed")
-                self._dbusservice['/ErrorCode'] = 27 # charger short circuit
-            elif self.solar_controller["alarm_info"][0] == 13: # battery reverse connectivity ('doh!)
-                logger.info("battery polarity is reversed")
-                self._dbusservice['/ErrorCode'] = 27 # charger short circuit
-            else: # ignore everything else and or set to 0
-                self._dbusservice['/ErrorCode'] = 0 # battery high irpple current
-
-        # increment UpdateIndex - to show that new data is available
-        self.loop_index = self._dbusservice["/UpdateIndex"] + 1  # increment index
-        if self.loop_index > 255:  # maximum value of the index
-            self.loop_index = 0  # overflow from 255 to 0
-        self._dbusservice["/UpdateIndex"] = self.loop_index
+        # collect every change of this cycle and send them out as one ItemsChanged signal at the end
+        #    of the with block, instead of a PropertiesChanged signal per path. values that only
+        #    moved inside their deadband are held back on the way (see deadband.py)
+        with self.deadband.batch(self._dbusservice) as s:
+            # a new day counts even if the link monitor drops the snapshot it came with, it is dealt
+            #    with on the next one that is published
+            self.rollover_days += snapshot.rollover
+
+            # the link monitor deals with failed cycles and probes, only fresh data is published
+            if self.link.report(snapshot):
+                self.solar_controller = snapshot.registers
+                if self.warm:
+                    # the controller answered, what came from the last run is overwritten below
+                    self.warm = {}
+                    s['/Mgmt/Stale'] = 0
+                # what the worker's rollover detector saw last, for the next run
+                self.rollover_state = {name: self.solar_controller[name][0] for name in ("uptime", "power_gen_day")}
+                days, self.rollover_days = self.rollover_days, 0
+                if days:
+                    # the controller started a new day, every day moved up one (or more if we missed some).
+                    #    the worker read the history of the new day in the same cycle, see acquisition.py
+                    if self.store is not None:
+                        self.store.flush(force=True)
+                    self.day0 = min(self.day0 + datetime.timedelta(days=days), datetime.date.today())
+                    for day in range(self.history_days_registered):
+                        self._restore_day(s, day)
+                    # and the store has one day more to look through
+                    self.store_days_checked = 0
+                    self.warm_due = True
+                    if self.yield_base is not None:
+                        logger.info(f"day done, yield {s['/Yield/User']}Wh, integrated {self.pv_energy.wh:.1f}Wh "
+                                    f"since {self.yield_base}Wh, {self.pv_energy.gap:.0f}s not integrated")
+                    self.pv_energy.reset()
+                    self.battery_energy.reset()
+                    self.yield_base = None
+
+                s['/ProductName'] = _convert_to_string(self.solar_controller['system_info'])
+                # these are just converted to integers and divided by 100 (for now)
+                s['/FirmwareVersion'] = (self.solar_controller['sver'][0] / 100)
+                s['/HardwareVersion'] = (self.solar_controller['hver'][0] / 100)
+
+                s['/Dc/0/Voltage'] = (self.solar_controller["battery_voltage"][0] / 10 )
+                s['/Dc/0/Current'] = (self.solar_controller["solar_current"][0] * 0.01)
+                s['/Dc/0/Temperature'] = (self.solar_controller["temperatures"][0] >> 0 & 0xff) # <-- lower 8 bits
+                s['/MppTemperature'] = (self.solar_controller["temperatures"][0] >> 8 & 0xff) # <-- lower 8 bits
+
+                s['/Pv/V'] = (self.solar_controller["solar_voltage"][0] / 10)
+                s['/Pv/P'] = (self.solar_controller["solar_power"][0])
+                s['/Yield/Power'] = (self.solar_controller["solar_power"][0]) # in Wh (System yield in GUI)
+                s['/Yield/User'] = (self.solar_controller["power_gen_day"][0]) # in Wh (Total yield in GUI)
+
+                # integrate the power of this cycle, O(1) whatever the length of the day
+                if self.yield_base is None:
+                    self.yield_base = self.solar_controller["power_gen_day"][0]
+                self.pv_energy.add(snapshot.monotonic, self.solar_controller["solar_power"][0])
+                self.battery_energy.add(snapshot.monotonic, s['/Dc/0/Voltage'] * s['/Dc/0/Current'])
+                s['/Integrated/Yield'] = round(self.pv_energy.wh, 2)
+                s['/Integrated/BatteryCharge'] = round(self.battery_energy.wh, 2)
+                s['/Integrated/YieldDeviation'] = round(
+                    self.pv_energy.wh - (self.solar_controller["power_gen_day"][0] - self.yield_base), 2)
+                s['/Integrated/Gap'] = int(self.pv_energy.gap)
+
+                self._register_history(s, self.solar_controller["uptime"][0])
+                s['/History/Overall/DaysAvailable'] = max(self.history_days_registered, self.store_days_found)
+                s['/History/Daily/0/Yield'] = (self.solar_controller["power_gen_day"][0] / 1000) # in watts
+                s['/History/Daily/0/MaxPower'] = (self.solar_controller["max_power_day"][0]) # in watts
+
+                # state is the current method the battery is being charged (bulk, absortion, float)
+                state = _calculate_state(self.solar_controller["load_status"][0],\
+                                         self.solar_controller["solar_current"][0] * 0.01,\
+                                         self.solar_controller["battery_voltage"][0] / 10)
+                s['/State'] = state
+
+                # it costs us very little to update the same variables in memory (this isn't low latency programming)
+                # '0hist': [115, 0, 248, 145, 131] charge Wh/today, load today, max power gen todat (watt), max battery, min battery
+                for day in range(self.controller_days):
+                    history_key = str(day) + "hist"
+
+                    # this are all stored on device
+                    for name, value in decode_day(self.solar_controller[history_key]).items():
+                        s[f"/History/Daily/{day}/{name}"] = value
+
+                # if we have a new maximum battery current, reflect it today - this is not stored on the ms4840n
+                if s['/Dc/0/Current'] > s['/History/Daily/0/MaxBatteryCurrent']:
+                    s['/History/Daily/0/MaxBatteryCurrent'] = s['/Dc/0/Current']
+
+                # if we have a new maximum solar voltage, reflect it today - this is not stored on the ms4840n
+                if s['/Pv/V'] > s['/History/Daily/0/MaxPvVoltage']:
+                    s['/History/Daily/0/MaxPvVoltage'] = s['/Pv/V']
+
+                # do we have a new min/max overall battery voltage
+                if s['/Dc/0/Voltage'] > s['/History/Overall/MaxBatteryVoltage']:
+                    s['/History/Overall/MaxBatteryVoltage'] = s['/Dc/0/Voltage']
+                if s['/Dc/0/Voltage'] < s['/History/Overall/MinBatteryVoltage'] or not s['/History/Overall/MinBatteryVoltage']:
+                    s['/History/Overall/MinBatteryVoltage'] = s['/Dc/0/Voltage']
+
+                # do we have a new overall solar voltage - this is not storage on the ms4840n
+                if s['/Pv/V'] > s['/History/Overall/MaxPvVoltage']:
+                    s['/History/Overall/MaxPvVoltage'] = s['/Pv/V']
+
+                # total power generation all time in WH
+                s['/Yield/System'] = (self.solar_controller['total_power_generation'][0] << 16 |
+                                      self.solar_controller['total_power_generation'][1])
+                # any errors - https://www.victronenergy.com/live/mppt-error-codes
+                if self.solar_controller["alarm_info"][0] == 0: # no error
+                    s['/ErrorCode'] = 0 # no error
+                elif self.solar_controller["alarm_info"][0] == 1: # battery over discharged
+                    logger.info("battery is over discharged")
+                    s['/ErrorCode'] = 0 # no error - victron doens't have this error
+                elif self.solar_controller["alarm_info"][0] == 2: # battery over voltage
+                    logger.info("battery voltage is low")
+                    s['/ErrorCode'] = 2 # battery voltage too high
+                elif self.solar_controller["alarm_info"][0] == 3: # load short circuit
+                    logger.info("load short circuit - check rs484/temp cables")
+                    s['/ErrorCode'] = 8 # battery voltage sense disconnected
+                elif self.solar_controller["alarm_info"][0] == 4: # load power too big or load open circuit
+                    logger.info("load power too big or load open circuit")
+                    s['/ErrorCode'] = 18 # controller over-current
+                elif self.solar_controller["alarm_info"][0] == 5: # controller temperature too high
+                    logger.info("solar controller temerature is too high")
+                    s['/ErrorCode'] = 22 # controller over-current
+                elif self.solar_controller["alarm_info"][0] == 6: # surrounding temperature too high
+                    logger.info("surrounding temperature is too high")
+                    s['/ErrorCode'] = 1 # battery temperature too high
+                elif self.solar_controller["alarm_info"][0] == 7: # input power too big (too high)
+                    logger.info("input power too big")
+                    s['/ErrorCode'] = 35 # pv over-power
+                elif self.solar_controller["alarm_info"][0] == 8: # input side short circuit
+                    logger.info("input side short circuit")
+                    s['/ErrorCode'] = 27 # charger short circuit
+                elif self.solar_controller["alarm_info"][0] == 9: # solar panel input over voltage
+                    logger.info(f"solar panel input is over voltage {s['/Pv/V']}")
+                    s['/ErrorCode'] = 33
+                elif self.solar_controller["alarm_info"][0] == 12: # solar panel reverse connectivity ('doh!)
+                    logger.info("solar panel polarity is reversed")
+                    s['/ErrorCode'] = 27 # charger short circuit
+                elif self.solar_controller["alarm_info"][0] == 13: # battery reverse connectivity ('doh!)
+                    logger.info("battery polarity is reversed")
+                    s['/ErrorCode'] = 27 # charger short circuit
+                else: # ignore everything else and or set to 0
+                    s['/ErrorCode'] = 0 # battery high irpple current
+
+                self._store_history(s)
+                # the values as read, not what the deadband let through
+                self.series.add(snapshot.timestamp, {path: s[path] for path in series_paths})
+
+            # increment UpdateIndex - to show that new data is available
+            self.loop_index = s["/UpdateIndex"] + 1  # increment index
+            if self.loop_index > 255:  # maximum value of the index
+                self.loop_index = 0  # overflow from 255 to 0
+            s["/UpdateIndex"] = self.loop_index
 
 
         # calculate the elapsed time if debugging is enabled
         if debugging == True:
             elapsed_time = (time.process_time() - start_time)
-            logger.debug("spent %f in _update" % (elapsed_time))
+            logger.debug("spent %f reading the controller, %f in _publish" % (snapshot.elapsed, elapsed_time))
             logger.debug(f'{self.solar_controller}')
 
-        # and we're done
-        return True
+
+def _data_path(servicename, extension):
+    return os.path.join(store_dir, servicename.split('.')[-1] + extension) # ttyUSB1.dat
+
+
+def _open_store(servicename):
+    path = _data_path(servicename, ".dat")
+    try:
+        return HistoryStore(path, days=store_days, flush_interval=store_flush_interval)
+    except (OSError, ValueError) as e:
+        logger.error(f"can't open {path}, the history the controller doesn't keep is lost on a restart: {e}")
+        return None
+
+
+def _dbusconnection():
+    return dbus.SessionBus(private=True) if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True)
+
 
 def main():
-    global servicename
     global debugging
 
+    # we need to know what serialport / usb to connect to and we expect that from the command line
+    parser = argparse.ArgumentParser(description="ms4840 mppt solar charger driver")
+    parser.add_argument("port", nargs="+",
+                        help="serial port(s) of the controller(s), for example /dev/ttyUSB1 /dev/ttyUSB2")
+    parser.add_argument("--address", type=int, nargs="+", default=controller_addresses,
+                        help="modbus address(es) of the controller(s) on every port")
+    args = parser.parse_args()
+
+    logger.info("")
+    logger.info("Starting dbus-ms4840")
+
+    # the first port names the pid file, see DbusHelper
+    servicename = 'com.victronenergy.solarcharger.' + args.port[0].split('/')[2] # ttyUSB1
+
     from dbus.mainloop.glib import DBusGMainLoop
     # Have a mainloop, so we can send/receive asynchronous calls to and from dbus
     DBusGMainLoop(set_as_default=True)
@@ -496,12 +804,66 @@ def main():
     helper = DbusHelper(1, servicename)
     helper.create_pid_file()
 
-    # create the mppt soalr charger object
-    ms4840 = MS4840(paths = solar_charger_dict)
+    # one worker per port, it owns the serial port and does all the reading for every controller on it.
+    #    all the services share this process and its main loop, which saves a python interpreter with
+    #    dbus, GLib and velib loaded for every extra port (see usage-compare.py)
+    workers = []
+    controllers = []
+    series = {} # {service: TimeSeries} for the SeriesServer, filled in as the ports come up
+
+    def _start_port(port, instances):
+        try:
+            worker = AcquisitionWorker(port, baud_rate=baud_rate, max_gap=max_register_gap, max_len=max_block_length)
+        except (serial.SerialException, OSError) as e:
+            # one missing usb adapter doesn't take the controllers on the other ports down with it
+            logger.error(f"can't open {port}, trying again in {port_retry_interval}s: {e}")
+            return True
+        workers.append(worker)
+
+        # create the mppt soalr charger object(s), one service per controller on the bus
+        port_servicename = 'com.victronenergy.solarcharger.' + port.split('/')[2] # ttyUSB1
+        for address, instance in zip(args.address, instances):
+            name = port_servicename if len(args.address) == 1 else f"{port_servicename}_mb{address}"
+            controller = MS4840(solar_charger_dict, worker, address, name, instance)
+            controllers.append(controller)
+            series[name.split('.')[-1]] = controller.series
+
+        # ask the worker for new data every second, the serial i/o never happens on the main loop
+        worker.start()
+        GLib.timeout_add(1000, lambda: worker.poll() or True)
+        return False # started, no more retries
+
+    # the device instances are handed out by the order of the ports on the command line, whenever they come up
+    for i, port in enumerate(args.port):
+        instances = [deviceinstance + i * len(args.address) + j for j in range(len(args.address))]
+        if _start_port(port, instances):
+            GLib.timeout_add_seconds(port_retry_interval, _start_port, port, instances)
+
+    # kill -USR1 <pid> re-reads the whole history on the next cycle
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1,
+                         lambda: [worker.refresh_history() for worker in workers] and True)
+
+    # range queries on the live history of every controller, see series-query.py
+    try:
+        server = SeriesServer(series_socket.format(servicename.split('.')[-1]), series)
+    except OSError as e:
+        logger.error(f"can't serve the live history: {e}")
+        server = None
+
+    mainloop = GLib.MainLoop()
+
+    # svc -d sends a TERM, write out what the stores still hold before we go
+    def _shutdown():
+        for controller in controllers:
+            controller.close()
+        if server is not None:
+            server.close()
+        mainloop.quit()
+        return False
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, _shutdown)
 
     # and off to the races we go
     logger.info('Connected to dbus, and switching over to GLib.MainLoop() (= event based)')
-    mainloop = GLib.MainLoop()
     mainloop.run()
 
 
@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+
+
+class DeadbandFilter(object):
+    """
+    Keeps values that only jitter by a bit or two off the dbus. Paths opt in with keys next to
+    their entry in the paths dict:
+
+        deadband     - the value has to move more than this (in the unit of the path) from what
+                       was published last before it is published again
+        deadband_rel - same, as a fraction of the last published value (0.01 is 1%), the larger
+                       of the two bands counts
+        heartbeat    - seconds after which a value that stayed inside the band is published
+                       anyway, so a slow drift still shows up
+
+    The band is measured from the last published value, not from the previous reading, so a
+    value going back and forth doesn't get through and one creeping in one direction does.
+    Going to or from None (or any value that isn't a number) always gets through.
+    """
+    def __init__(self, paths, clock=time.monotonic):
+        self.clock = clock
+        self._rules = {}
+        for path, settings in paths.items():
+            if "deadband" in settings or "deadband_rel" in settings:
+                self._rules[path] = (settings.get("deadband", 0), settings.get("deadband_rel", 0),
+                                     settings.get("heartbeat"))
+        self._published = {} # path: (value, when)
+
+    @contextmanager
+    def batch(self, service):
+        """
+        enter the batch of the VeDbusService (one ItemsChanged signal at the end) with the filter
+        in front of it, values written in the with block only reach the service if they pass
+        """
+        with service as context:
+            yield _FilteredContext(self, context, self.clock())
+
+    def passes(self, path, value, now):
+        """True if value has to be published, remembers it as published in that case"""
+        rule = self._rules.get(path)
+        if rule is None:
+            return True
+
+        last = self._published.get(path)
+        if last is not None and _is_number(value) and _is_number(last[0]):
+            last_value, when = last
+            absolute, relative, heartbeat = rule
+            band = max(absolute, relative * abs(last_value))
+            if abs(value - last_value) <= band and (heartbeat is None or now - when < heartbeat or value == last_value):
+                return False
+
+        self._published[path] = (value, now)
+        return True
+
+
+class _FilteredContext(object):
+    # stands in for the ServiceContext of the batch. reading a path returns what was written to it
+    #    in this batch even if the filter held it back, the calculations in _publish (max current
+    #    of the day and so on) want the real reading and not the published one
+    def __init__(self, deadband, context, now):
+        self._deadband = deadband
+        self._context = context
+        self._now = now
+        self._written = {}
+
+    def __contains__(self, path):
+        return path in self._context
+
+    def __getitem__(self, path):
+        if path in self._written:
+            return self._written[path]
+        return self._context[path]
+
+    def __setitem__(self, path, value):
+        self._written[path] = value
+        if self._deadband.passes(path, value, self._now):
+            self._context[path] = value
+
+    def add_path(self, path, value, *args, **kwargs):
+        self._context.add_path(path, value, *args, **kwargs)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
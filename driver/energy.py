@@ -0,0 +1,34 @@
+class EnergyIntegrator(object):
+    """
+    Adds up the energy of a power that is sampled every now and then, the trapezoid between every
+    two samples, in Wh. The controller's own day counter (power_gen_day) only has whole Wh, this
+    has whatever the samples are worth.
+
+    A sample that comes more than max_gap seconds after the one before it doesn't get the time in
+    between, we don't know what the power did while we didn't look (link down, driver busy), that
+    time is added to gap instead. t is in seconds and has to come from a monotonic clock.
+    """
+    def __init__(self, max_gap=10):
+        self.max_gap = max_gap
+        self.wh = 0.0
+        self.gap = 0.0 # seconds that weren't integrated
+        self._t = None
+        self._p = None
+
+    def add(self, t, power):
+        """power in W, None if we don't know it (which ends the trapezoid like a gap does)"""
+        if power is not None and self._p is not None:
+            dt = t - self._t
+            if 0 < dt <= self.max_gap:
+                self.wh += (self._p + power) * dt / 7200 # (p0 + p1) / 2 * dt / 3600
+            elif dt > 0:
+                self.gap += dt
+        elif self._t is not None and t > self._t:
+            self.gap += t - self._t
+        self._t = t
+        self._p = power
+
+    def reset(self):
+        """start at 0 Wh again, the next sample still joins up with the last one"""
+        self.wh = 0.0
+        self.gap = 0.0
@@ -0,0 +1,119 @@
+from registermap import max_modbus_registers
+from rtu import IllegalRequestError
+from utils import logger
+
+# the daily history lives at 0x0400h + day, every day is a 5 word record
+#    [charge Wh today, load Wh today, max power gen today (watt), max battery (0.1V), min battery (0.1V)]
+history_base_reg = 1024
+history_record_len = 5
+
+
+def decode_day(record):
+    """turns a 5 word day record into the values we publish under /History/Daily/<day>/"""
+    return {
+        "Yield": record[0] / 1000, # labeled as kWh in GUI, ms4840 reports WH
+        "MaxPower": record[2],
+        "MaxBatteryVoltage": record[3] / 10,
+        "MinBatteryVoltage": record[4] / 10,
+    }
+
+
+class HistoryReader(object):
+    """
+    Fetches the daily history records of the ms4840.
+
+    The history registers are read as one window (history_base_reg .. + days + 4) in as few
+    max_len reads as possible and every day is sliced out of that single buffer. Not every
+    firmware lays the history out as plain registers though, some hand out a full day record
+    for every address instead. So the first read also fetches two days on their own and only
+    keeps using the bulk window if it agrees with them, otherwise we stay with one read per day.
+
+    The read methods are generators that yield after every modbus transaction, so the worker
+    can take turns with the other controllers on the same bus, use them with
+    records = yield from reader.read(read_registers)
+    """
+    def __init__(self, days, max_len=max_modbus_registers):
+        self.days = days
+        self.max_len = min(max_len, max_modbus_registers)
+        self.bulk = None # None until we know what the controller does
+
+    def read(self, read_registers):
+        """
+        read_registers(reg, len) does the actual modbus read, returns a list with the record
+        for every day (index 0 is today)
+        """
+        if self.bulk is None:
+            return (yield from self._probe(read_registers))
+        if self.bulk:
+            return (yield from self._read_bulk(read_registers))
+        return (yield from self._read_days(read_registers, range(self.days)))
+
+    def read_today(self, read_registers):
+        """only the record of the current day, the only one that changes during the day"""
+        record = read_registers(history_base_reg, history_record_len)
+        yield
+        return record
+
+    def _read_bulk(self, read_registers):
+        window = self.days + history_record_len - 1
+        buffer = []
+        for offset in range(0, window, self.max_len):
+            buffer.extend(read_registers(history_base_reg + offset, min(self.max_len, window - offset)))
+            yield
+        return [buffer[day:day + history_record_len] for day in range(self.days)]
+
+    def _read_days(self, read_registers, days):
+        records = []
+        for day in days:
+            records.append(read_registers(history_base_reg + day, history_record_len))
+            yield
+        return records
+
+    def _probe(self, read_registers):
+        try:
+            records = yield from self._read_bulk(read_registers)
+        except IllegalRequestError:
+            logger.info("controller refuses bulk history reads, reading the history one day at a time")
+            self.bulk = False
+            return (yield from self._read_days(read_registers, range(self.days)))
+
+        # day 0 looks the same either way, day 1 tells us how the history is laid out
+        probe_days = min(2, self.days)
+        probed = yield from self._read_days(read_registers, range(probe_days))
+        if probed == records[:probe_days]:
+            logger.info("using bulk history reads")
+            self.bulk = True
+            return records
+
+        logger.info("history records don't line up in a bulk read, reading the history one day at a time")
+        self.bulk = False
+        return probed + (yield from self._read_days(read_registers, range(probe_days, self.days)))
+
+
+class RolloverDetector(object):
+    """
+    Watches the cheap live registers for the controller starting a new day, which is the only
+    time the stored history (days 1 and up) changes. A new day shows up as the uptime day
+    counter moving on, or as the generated power of the day going back down (reset at dawn).
+    uptime and power_gen_day are what was seen last, from the last run for example, so a day
+    that started while nobody was watching is still noticed.
+    """
+    def __init__(self, uptime=None, power_gen_day=None):
+        self.uptime = uptime
+        self.power_gen_day = power_gen_day
+
+    def check(self, registers):
+        """
+        registers is the {pdu_name: values} dict, returns the number of days the controller moved
+        on (0 if it didn't, 1 if it was reset and its uptime went back)
+        """
+        uptime = registers["uptime"][0]
+        power_gen_day = registers["power_gen_day"][0]
+        days = 0
+        if self.uptime is not None and uptime != self.uptime:
+            days = max(uptime - self.uptime, 1)
+        elif self.power_gen_day is not None and power_gen_day < self.power_gen_day:
+            days = 1
+        self.uptime = uptime
+        self.power_gen_day = power_gen_day
+        return days
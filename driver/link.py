@@ -0,0 +1,72 @@
+from gi.repository import GLib
+from utils import logger
+
+
+class LinkMonitor(object):
+    """
+    Connection state machine of one controller, lives on the main loop and is fed with the
+    snapshots of its device.
+
+    connected - every cycle reads the device as usual, after failure_threshold failed cycles
+                in a row the link goes down
+    down      - the worker leaves the device alone, a GLib timer brings us to probing after
+                the back-off delay (backoff_min, doubling up to backoff_max)
+    probing   - the next cycle only reads one cheap register, if it answers we are connected
+                again, otherwise we go down for twice as long
+
+    on_change(connected) is called when the link goes down or comes back.
+    """
+    def __init__(self, device, on_change, failure_threshold=3, backoff_min=2, backoff_max=300):
+        self.device = device
+        self.on_change = on_change
+        self.failure_threshold = failure_threshold
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.state = "connected"
+        self.failures = 0
+        self.delay = backoff_min
+
+    def report(self, snapshot):
+        """feed the snapshot of a cycle, returns True if it holds fresh data to publish"""
+        if self.state == "down" or (self.state == "probing" and snapshot.mode != "probe"):
+            # left over from before the link went down
+            return False
+
+        if snapshot.error is None:
+            if self.state != "connected":
+                logger.info(f"controller {self.device.address} is back")
+                self.state = "connected"
+                self.failures = 0
+                self.delay = self.backoff_min
+                self.device.mode = "full"
+                # might be a different controller by now, read everything again
+                self.device.resync()
+                self.on_change(True)
+            if self.failures:
+                logger.info(f"controller {self.device.address} answers again")
+            self.failures = 0
+            return snapshot.mode == "full"
+
+        if self.state == "probing":
+            self.delay = min(self.delay * 2, self.backoff_max)
+            self._down()
+            return False
+
+        self.failures += 1
+        if self.failures == 1:
+            logger.info(f"controller {self.device.address} failed to answer: {snapshot.error}")
+        if self.failures >= self.failure_threshold:
+            self._down()
+            self.on_change(False)
+        return False
+
+    def _down(self):
+        self.state = "down"
+        self.device.mode = "idle"
+        logger.info(f"controller {self.device.address} is not answering, trying again in {self.delay}s")
+        GLib.timeout_add(int(self.delay * 1000), self._probe)
+
+    def _probe(self):
+        self.state = "probing"
+        self.device.mode = "probe"
+        return False # only once
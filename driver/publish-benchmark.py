@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+# measures what one _publish cycle costs: the dbus signals it sends and the cpu time it takes.
+#    "before" writes every path on its own (a PropertiesChanged signal per changed path), "after"
+#    is how the driver publishes now (one ItemsChanged signal per cycle, see MS4840._publish)
+#
+#    on the GX (stop the real driver first, we register a service of our own):
+#        python publish-benchmark.py [cycles]
+#    on a pc, the driver logs to /data/log/dbus-ms4840 so that has to exist:
+#        dbus-run-session python publish-benchmark.py [cycles]
+
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import types
+from dbus.mainloop.glib import DBusGMainLoop
+
+DBusGMainLoop(set_as_default=True)
+
+# dbus-ms4840.py isn't a valid module name, load it by hand
+spec = importlib.util.spec_from_file_location("ms4840", os.path.join(os.path.dirname(__file__), "dbus-ms4840.py"))
+driver = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(driver)
+# keep the history store away from the real one in /data
+driver.store_dir = tempfile.mkdtemp()
+
+from acquisition import Snapshot  # noqa: E402
+from vedbus import VeDbusService, VeDbusItemExport, VeDbusRootExport, VeDbusFallbackExport  # noqa: E402
+
+# taken from the example at the bottom of dbus-ms4840.py
+registers = {
+    'sver': [121], 'hver': [100], 'system_info': [8224, 19795, 11572, 14388, 12366, 8224, 8224, 8224],
+    'load_status': [4], 'current_system_voltage': [12], 'battery_power': [100], 'battery_voltage': [146],
+    'solar_current': [55], 'solar_power': [8], 'temperatures': [8737], 'solar_voltage': [417],
+    'max_power_day': [248], 'power_gen_day': [205], 'alarm_info': [0], 'battery_type': [4], 'uptime': [51],
+    'total_power_generation': [0, 8550],
+}
+for day in range(driver.history_days):
+    registers[str(day) + "hist"] = [100 + day, 0, 50 + day, 147, 131]
+
+signals = {"PropertiesChanged": 0, "ItemsChanged": 0}
+
+
+def _count(cls, name, signal=None):
+    original = getattr(cls, name)
+    signal = signal or name
+
+    def counted(self, *args, **kwargs):
+        signals[signal] += 1
+        return original(self, *args, **kwargs)
+    setattr(cls, name, counted)
+
+
+_count(VeDbusItemExport, "PropertiesChanged")
+_count(VeDbusRootExport, "ItemsChanged")
+# with dbus_fallback_export the one fallback object sends all the signals
+_count(VeDbusFallbackExport, "send_properties_changed", "PropertiesChanged")
+_count(VeDbusFallbackExport, "ItemsChanged")
+
+
+class BenchWorker(object):
+    # stands in for the AcquisitionWorker, we hand _publish the snapshots ourselves
+    def add_device(self, address, *args, **kwargs):
+        return types.SimpleNamespace(address=address, mode="full", resync=lambda: None)
+
+
+def _snapshot(cycle):
+    # the values that move every second on a sunny day
+    regs = dict(registers)
+    regs["battery_voltage"] = [146 + cycle % 3]
+    regs["solar_current"] = [55 + cycle % 7]
+    regs["solar_power"] = [80 + cycle % 11]
+    regs["solar_voltage"] = [417 + cycle % 5]
+    return Snapshot(time.time(), regs, None, 0, "full", time.monotonic())
+
+
+def _run(ms4840, cycles):
+    for key in signals:
+        signals[key] = 0
+    start = time.process_time()
+    for cycle in range(cycles):
+        ms4840._publish(_snapshot(cycle))
+    elapsed = time.process_time() - start
+    return dict(signals), elapsed / cycles
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    driver.solar_charger_dict["/UpdateIndex"] = {"value": 0, "textformat": driver._n}
+    ms4840 = driver.MS4840(driver.solar_charger_dict, BenchWorker(), 1,
+                           "com.victronenergy.solarcharger.benchmark", driver.deviceinstance)
+
+    # before: the with block in _publish hands out the service itself, every write signals on its own
+    enter, exit = VeDbusService.__enter__, VeDbusService.__exit__
+    VeDbusService.__enter__ = lambda self: self
+    VeDbusService.__exit__ = lambda self, *exc: None
+    before = _run(ms4840, cycles)
+    VeDbusService.__enter__, VeDbusService.__exit__ = enter, exit
+
+    after = _run(ms4840, cycles)
+    ms4840.close()
+
+    print("%-8s %18s %13s %14s" % ("", "PropertiesChanged", "ItemsChanged", "cpu ms/cycle"))
+    for name, (counts, cpu) in (("before", before), ("after", after)):
+        print("%-8s %18.1f %13.1f %14.3f" % (name, counts["PropertiesChanged"] / cycles,
+                                            counts["ItemsChanged"] / cycles, cpu * 1000))
+    print(f"per cycle, over {cycles} cycles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from utils import logger
+
+# the ms4840 answers reads of up to 125 registers per request like any other modbus slave,
+#    but we don't need anywhere near that to cover the live data block
+max_modbus_registers = 125
+
+
+class RegisterBlock(object):
+    """
+    One modbus read (reg, len) and the named pdu entries that live inside of it.
+    members is a list of (name, offset, len) where offset is relative to reg.
+    """
+    def __init__(self, reg, length, members):
+        self.reg = reg
+        self.len = length
+        self.members = members
+
+    def split(self, values):
+        """hand every member its slice of the values read for this block"""
+        return {name: values[offset:offset + length] for name, offset, length in self.members}
+
+    def __repr__(self):
+        return "RegisterBlock(reg=%d, len=%d, members=%s)" % (self.reg, self.len, [m[0] for m in self.members])
+
+
+class RegisterPlanner(object):
+    """
+    Merges the entries of a pdu address map ({name: {"reg": x, "len": y}}) into the fewest
+    block reads we can get away with.
+
+    max_gap    - how many unused registers we are willing to read (and throw away) to join
+                 two entries into one read
+    max_len    - the longest read we issue, never more than max_modbus_registers
+
+    Entries with "coalesce": False are always read on their own, for example the history
+    registers where every address returns a whole day record instead of one word.
+    """
+    def __init__(self, pdu_addresses, max_gap=4, max_len=32):
+        self.pdu_addresses = pdu_addresses
+        self.max_gap = max_gap
+        self.max_len = min(max_len, max_modbus_registers)
+        self._plans = {}
+        # entries the controller refused to hand out as part of a bigger read
+        self._no_coalesce = set()
+
+    def plan(self, names):
+        """returns the list of RegisterBlocks that cover names, plans are cached per set of names"""
+        key = frozenset(names)
+        blocks = self._plans.get(key)
+        if blocks is None:
+            blocks = self._plans[key] = self._build(key)
+            logger.debug(f"register plan for {len(key)} entries: {blocks}")
+        return blocks
+
+    def refuse(self, block):
+        """
+        the controller rejected a merged read (illegal data address, most likely because of
+        a hole in its register map), read these members on their own from now on
+        """
+        for name, offset, length in block.members:
+            self._no_coalesce.add(name)
+        self._plans.clear()
+        logger.info(f"controller refused block read at {block.reg}+{block.len}, reading {[m[0] for m in block.members]} separately")
+
+    def _coalescable(self, name):
+        return self.pdu_addresses[name].get("coalesce", True) and name not in self._no_coalesce
+
+    def _build(self, names):
+        blocks = []
+        merge = []
+        single = {}
+        for name in names:
+            reg = self.pdu_addresses[name]["reg"]
+            length = self.pdu_addresses[name]["len"]
+            if self._coalescable(name):
+                merge.append((reg, length, name))
+            elif (reg, length) in single:
+                # same registers under another name, one read is enough for both
+                single[(reg, length)].members.append((name, 0, length))
+            else:
+                single[(reg, length)] = RegisterBlock(reg, length, [(name, 0, length)])
+        blocks.extend(single.values())
+
+        # walk the entries in register order and grow the current block as long as the gap
+        # and the total length stay within bounds
+        current = None
+        for reg, length, name in sorted(merge):
+            if current is not None:
+                end = current.reg + current.len
+                new_end = max(end, reg + length)
+                if reg - end <= self.max_gap and new_end - current.reg <= self.max_len:
+                    current.len = new_end - current.reg
+                    current.members.append((name, reg - current.reg, length))
+                    continue
+                blocks.append(current)
+            current = RegisterBlock(reg, length, [(name, 0, length)])
+        if current is not None:
+            blocks.append(current)
+
+        return sorted(blocks, key=lambda b: b.reg)
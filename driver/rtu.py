@@ -0,0 +1,224 @@
+import os
+import select
+import struct
+import time
+import serial
+
+# modbus exception codes that mean we asked for something the slave doesn't have
+illegal_request_codes = (1, 2, 3) # illegal function, illegal data address, illegal data value
+
+
+class ModbusError(IOError):
+    pass
+
+
+class NoResponseError(ModbusError):
+    """nothing came back before the timeout"""
+    pass
+
+
+class InvalidResponseError(ModbusError):
+    """something came back, but not a frame we can use (short, bad crc, wrong slave...)"""
+    pass
+
+
+class SlaveReportedException(ModbusError):
+    """the slave answered with a modbus exception response"""
+    def __init__(self, code):
+        ModbusError.__init__(self, "slave reported exception code %d" % code)
+        self.code = code
+
+
+class IllegalRequestError(SlaveReportedException):
+    pass
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for bit in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+crc_table = _crc_table()
+
+
+def crc16(data, length=None):
+    """modbus crc16 of the first length bytes of data (all of it by default), table driven"""
+    crc = 0xFFFF
+    table = crc_table
+    for byte in (data if length is None else memoryview(data)[:length]):
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+class TurnaroundEstimator(object):
+    """
+    Learns how long a slave takes to start answering, the same way tcp learns its retransmit
+    timeout (rfc 6298): a smoothed average plus four times the smoothed deviation, within
+    bounds. Every miss doubles the timeout (up to maximum) until answers come in again, so a
+    controller that is slow around dawn gets more room instead of failing over and over.
+    """
+    def __init__(self, initial, minimum, maximum, alpha=0.125, beta=0.25):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.alpha = alpha
+        self.beta = beta
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+
+    def timeout(self):
+        return self.rto
+
+    def sample(self, delay):
+        if self.srtt is None:
+            self.srtt = delay
+            self.rttvar = delay / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - delay)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * delay
+        self.rto = min(max(self.srtt + 4 * self.rttvar, self.minimum), self.maximum)
+
+    def missed(self):
+        self.rto = min(self.rto * 2, self.maximum)
+
+
+class ModbusRtuClient(object):
+    """
+    A lean modbus rtu master for the ms4840, straight on top of pyserial.
+
+    The request and response buffers are allocated once and the response is read straight into
+    them (os.readv), the crc comes from a table. We know how long the answer should be, so a
+    transaction is done the moment the last byte is in instead of waiting for a timeout. A frame
+    that stops short ends after a silent interval of 3.5 characters (or frame_slack, whatever is
+    longer, usb serial adapters hand bytes over in chunks).
+
+    How long we give the slave to start answering is learned per register group (key) with a
+    TurnaroundEstimator, timeout is where it starts and min_timeout/max_timeout bound it.
+
+    Only works on posix, which is fine for a GX device.
+    """
+    def __init__(self, port, baudrate=9600, timeout=0.2, min_timeout=0.03, max_timeout=1.0, frame_slack=0.02):
+        self.serial = serial.Serial(port, baudrate, bytesize=8, parity=serial.PARITY_NONE, stopbits=1, timeout=0)
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._estimators = {}
+        self._fd = self.serial.fileno()
+
+        # start bit + data bits + parity + stop bits
+        bits = 1 + self.serial.bytesize + (self.serial.parity != serial.PARITY_NONE) + self.serial.stopbits
+        self.char_time = bits / baudrate
+        self.silent_interval = max(3.5 * self.char_time, frame_slack)
+
+        # address, function code, register, count, crc
+        self._request = bytearray(8)
+        # address, function code, byte count, 125 registers, crc
+        self._response = bytearray(5 + 2 * 125)
+        self._view = memoryview(self._response)
+        self._structs = {}
+        self._last_io = 0
+
+    def frame_time(self, length):
+        """seconds it takes to put length bytes on the wire"""
+        return length * self.char_time
+
+    def estimator(self, address, key):
+        """the turnaround estimator of a register group of a slave"""
+        estimator = self._estimators.get((address, key))
+        if estimator is None:
+            estimator = self._estimators[(address, key)] = \
+                TurnaroundEstimator(self.timeout, self.min_timeout, self.max_timeout)
+        return estimator
+
+    def read_registers(self, address, reg, count, functioncode=3, key=None):
+        """
+        read count holding (3) or input (4) registers starting at reg, returns a list of ints.
+        key names the register group the response time is learned for, reg by default.
+        """
+        request = self._request
+        struct.pack_into(">BBHH", request, 0, address, functioncode, reg, count)
+        crc = crc16(request, 6)
+        request[6] = crc & 0xFF
+        request[7] = crc >> 8
+
+        # keep the line quiet for the silent interval between frames
+        wait = self._last_io + 3.5 * self.char_time - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        self.serial.reset_input_buffer()
+        sent = time.monotonic()
+        self.serial.write(request)
+
+        # the request has to go out, then the slave thinks, then the first byte comes back
+        estimator = self.estimator(address, reg if key is None else key)
+        expected = 5 + 2 * count
+        got, first = self._receive(expected, self.frame_time(len(request)) + estimator.timeout() + self.char_time)
+        self._last_io = time.monotonic()
+        if got == 0:
+            estimator.missed()
+        else:
+            estimator.sample(first - sent - self.frame_time(len(request)) - self.char_time)
+        return self._decode(address, functioncode, count, got)
+
+    def _receive(self, expected, timeout):
+        """
+        reads the response into our buffer until expected bytes are in, returns how many we got
+        and when the first of them came in
+        """
+        fd = self._fd
+        view = self._view
+        got = 0
+        first = None
+        deadline = time.monotonic() + timeout
+        while got < expected:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select((fd,), (), (), remaining)[0]:
+                break
+            n = os.readv(fd, (view[got:expected],))
+            if n == 0:
+                raise ModbusError("serial port %s went away" % self.serial.port)
+            if first is None:
+                first = time.monotonic()
+            got += n
+            # the rest of the frame has to follow without a silent interval
+            deadline = time.monotonic() + self.silent_interval
+        return got, first
+
+    def _decode(self, address, functioncode, count, got):
+        response = self._response
+        if got == 0:
+            raise NoResponseError("no response from slave %d" % address)
+        if got >= 5 and response[1] == functioncode | 0x80:
+            # exception response: address, function code | 0x80, exception code, crc
+            got = 5
+        elif got != 5 + 2 * count:
+            raise InvalidResponseError("short response from slave %d, %d bytes" % (address, got))
+
+        crc = crc16(response, got - 2)
+        if response[got - 2] != crc & 0xFF or response[got - 1] != crc >> 8:
+            raise InvalidResponseError("bad crc in response from slave %d" % address)
+        if response[0] != address:
+            raise InvalidResponseError("response from slave %d while talking to %d" % (response[0], address))
+
+        if got == 5:
+            code = response[2]
+            if code in illegal_request_codes:
+                raise IllegalRequestError(code)
+            raise SlaveReportedException(code)
+
+        if response[1] != functioncode or response[2] != 2 * count:
+            raise InvalidResponseError("unexpected response from slave %d" % address)
+
+        unpack = self._structs.get(count)
+        if unpack is None:
+            unpack = self._structs[count] = struct.Struct(">%dH" % count).unpack_from
+        return list(unpack(response, 3))
+
+    def close(self):
+        self.serial.close()
@@ -0,0 +1,45 @@
+import time
+
+
+class PollScheduler(object):
+    """
+    Decides which register groups are read in a cycle, based on deadlines instead of counting loops.
+
+    groups is a table like {name: {"entries": [pdu names], "period": seconds}}, or
+    {"policy": "once"} instead of a period for things that don't change while we run (versions,
+    product name). {"policy": "event"} groups are read at startup and after that only when
+    someone calls trigger(). A group is due when its deadline passed, slack allows for timer
+    jitter so a 1 second group polled from a 1 second timer isn't skipped every now and then.
+    """
+    def __init__(self, groups, slack=0.25, clock=time.monotonic):
+        self.groups = groups
+        self.slack = slack
+        self.clock = clock
+        # everything is due on the first cycle
+        self._deadlines = {name: 0 for name in groups}
+
+    def due(self, now=None):
+        """the names of the groups that should be read now"""
+        if now is None:
+            now = self.clock()
+        return [name for name, deadline in self._deadlines.items()
+                if deadline is not None and deadline <= now + self.slack]
+
+    def entries(self, names):
+        """the pdu entries of the given groups"""
+        return [entry for name in names for entry in self.groups[name].get("entries", ())]
+
+    def done(self, names, now=None):
+        """the groups were read, plan their next deadline. once and event groups are not due again by themselves"""
+        if now is None:
+            now = self.clock()
+        for name in names:
+            period = self.groups[name].get("period")
+            if self.groups[name].get("policy") == "once" or period is None:
+                self._deadlines[name] = None
+            else:
+                self._deadlines[name] = now + period
+
+    def trigger(self, name):
+        """make a group due on the next cycle, no matter its period or policy"""
+        self._deadlines[name] = 0
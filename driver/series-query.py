@@ -0,0 +1,56 @@
+#!/usr/bin/python
+
+# prints the recent history of a live value from the running dbus-ms4840 driver, without going
+#    over the dbus (see series.py), as csv: time, min, max, mean
+#
+#    python series-query.py                        lists the services and paths
+#    python series-query.py /Pv/V                  the last hour of /Pv/V, at the finest resolution kept
+#    python series-query.py /Pv/V --since 86400 --step 900 --service ttyUSB1
+#
+# the socket is named after the first port the driver was started with, --socket if that isn't ttyUSB1
+
+import argparse
+import datetime
+import json
+import socket
+import time
+
+series_socket = "/var/tmp/dbus-ms4840_{}.sock"
+
+
+def _ask(path, request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(json.dumps(request).encode() + b"\n")
+        answer = json.loads(s.makefile("rb").readline())
+    if "error" in answer:
+        raise SystemExit(answer["error"])
+    return answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="range queries on the live history of dbus-ms4840")
+    parser.add_argument("path", nargs="?", help="dbus path, for example /Pv/V")
+    parser.add_argument("--service", help="the service, ttyUSB1 or ttyUSB1_mb2 (default: the first one)")
+    parser.add_argument("--since", type=int, default=3600, help="seconds back from now (default: 3600)")
+    parser.add_argument("--step", type=int, help="resolution in seconds, the finest that goes back far enough otherwise")
+    parser.add_argument("--socket", default=series_socket.format("ttyUSB1"), help="the driver's socket")
+    args = parser.parse_args()
+
+    services = _ask(args.socket, {})["services"]
+    if args.path is None:
+        for service, paths in services.items():
+            print(f"{service}: {' '.join(paths)}")
+        return
+
+    end = int(time.time())
+    answer = _ask(args.socket, {"service": args.service or next(iter(services)), "path": args.path,
+                                "start": end - args.since, "end": end, "step": args.step})
+    print(f"# {args.path}, {answer['step']}s steps")
+    print("time,min,max,mean")
+    for t, low, high, mean in answer["rows"]:
+        print(f"{datetime.datetime.fromtimestamp(t).isoformat()},{low},{high},{mean}")
+
+
+if __name__ == "__main__":
+    main()
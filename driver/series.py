@@ -0,0 +1,261 @@
+import json
+import math
+import os
+import socket
+from array import array
+from gi.repository import GLib
+from utils import logger
+
+
+class Tier(object):
+    """
+    One resolution of a TimeSeries: the last length buckets of step seconds, kept in fixed size
+    arrays that are written round robin. Every bucket holds the min, max and mean of what came in
+    during it. A tier with step 1 gets about one value a second and only keeps the mean, which is
+its min and max as well.
+
+    The bucket that is still filling up lives in the accumulators below, it goes into the arrays
+    when the first value of the next bucket comes in, so add() is O(1) whatever the step is.
+    """
+    def __init__(self, step, length, channels):
+        self.step = step
+        self.length = length
+        self.times = array("I", [0]) * length # start of every bucket, unix time
+        self.mean = [array("f", [0.0]) * length for _ in range(channels)]
+        if step > 1:
+            self.min = [array("f", [0.0]) * length for _ in range(channels)]
+            self.max = [array("f", [0.0]) * length for _ in range(channels)]
+        else:
+            self.min = self.max = None
+        self.clear()
+
+    def clear(self):
+        channels = len(self.mean)
+        self.head = 0 # where the next bucket goes
+        self.count = 0
+        self.bucket = None # start of the open bucket
+        self._sum = [0.0] * channels
+        self._n = [0] * channels
+        self._min = [math.inf] * channels
+        self._max = [-math.inf] * channels
+
+    def add(self, t, values):
+        bucket = t - t % self.step
+        if bucket != self.bucket:
+            if self.bucket is not None:
+                self._close()
+            self.bucket = bucket
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            self._sum[i] += value
+            self._n[i] += 1
+            if value < self._min[i]:
+                self._min[i] = value
+            if value > self._max[i]:
+                self._max[i] = value
+
+    def _close(self):
+        head = self.head
+        self.times[head] = self.bucket
+        for i, n in enumerate(self._n):
+            if not n:
+                self.mean[i][head] = math.nan # a gap, min and max aren't looked at
+            else:
+                self.mean[i][head] = self._sum[i] / n
+                if self.min is not None:
+                    self.min[i][head] = self._min[i]
+                    self.max[i][head] = self._max[i]
+            self._sum[i] = 0.0
+            self._n[i] = 0
+            self._min[i] = math.inf
+            self._max[i] = -math.inf
+        self.head = (head + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def oldest(self):
+        """start of the oldest bucket we still have, None if there is none"""
+        if self.count:
+            return self.times[(self.head - self.count) % self.length]
+        return self.bucket
+
+    def _find(self, first, start):
+        # the first bucket (counted from the oldest one) that starts at or after start, a bisect over the ring
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(first + middle) % self.length] < start:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, channel, start, end):
+        """[(time, min, max, mean)] of the buckets that start in start..end, oldest first"""
+        first = (self.head - self.count) % self.length
+        mean = self.mean[channel]
+        low, high = (mean, mean) if self.min is None else (self.min[channel], self.max[channel])
+        result = []
+        for i in range(self._find(first, start), self.count):
+            index = (first + i) % self.length
+            t = self.times[index]
+            if t > end:
+                break
+            if not math.isnan(mean[index]):
+                result.append((t, low[index], high[index], mean[index]))
+        # and the bucket that is still open
+        if self.bucket is not None and start <= self.bucket <= end and self._n[channel]:
+            value = self._sum[channel] / self._n[channel]
+            if self.min is None:
+                result.append((self.bucket, value, value, value))
+            else:
+                result.append((self.bucket, self._min[channel], self._max[channel], value))
+        return result
+
+
+class TimeSeries(object):
+    """
+    The recent history of a few dbus paths at more than one resolution, see Tier. tiers is a list of
+    (step, length), finest first, for example [(1, 4 * 3600), (60, 14 * 1440)] keeps 4 hours of
+    seconds and two weeks of minutes. Values are float32, None counts as no value.
+    """
+    def __init__(self, paths, tiers):
+        self.paths = list(paths)
+        self.channels = {path: i for i, path in enumerate(self.paths)}
+        self.tiers = [Tier(step, length, len(self.paths)) for step, length in tiers]
+        self.last = None
+
+    def add(self, t, values):
+        """t is unix time in seconds, values is {path: value}"""
+        t = int(t)
+        if self.last is not None and t < self.last:
+            # the clock was set back (a GX without a battery backed clock starts in the past until ntp
+            #    sets it), the buckets have to stay in time order so we start over
+            logger.info(f"clock went back {self.last - t}s, dropping the live history")
+            for tier in self.tiers:
+                tier.clear()
+        self.last = t
+        row = [values.get(path) for path in self.paths]
+        for tier in self.tiers:
+            tier.add(t, row)
+
+    def query(self, path, start, end, step=None):
+        """
+        (step, [(time, min, max, mean)]) of path between start and end, from the finest tier that goes
+        back to start and is at least step seconds, the coarsest one if none does
+        """
+        channel = self.channels[path]
+        tiers = [tier for tier in self.tiers if step is None or tier.step >= step] or self.tiers[-1:]
+        tier = next((tier for tier in tiers if tier.oldest() is not None and tier.oldest() <= start), tiers[-1])
+        return tier.step, tier.query(channel, start, end)
+
+
+class SeriesServer(object):
+    """
+    Answers range queries on the TimeSeries of this process over a unix socket, so local tools get the
+    history of the live values without reading them over the dbus themselves (see series-query.py).
+    A request is one line of json, {"service": "ttyUSB1", "path": "/Pv/V", "start": .., "end": .., "step": ..},
+    the answer is one line of json as well and the connection is closed. Runs on the GLib main loop, the
+    connections are non blocking and read and written whenever they are ready (see _Query), so a slow
+    client doesn't hold up the dbus. A query only looks at memory.
+    """
+    def __init__(self, path, series, timeout=10):
+        self.path = path
+        self.series = series # {service: TimeSeries}
+        self.timeout = timeout # seconds a client gets to send its request and take the answer
+        if os.path.exists(path):
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(path)
+        self.socket.listen(4)
+        self.socket.setblocking(False)
+        GLib.io_add_watch(self.socket.fileno(), GLib.IO_IN, self._accept)
+
+    def _accept(self, fd, condition):
+        try:
+            connection, _ = self.socket.accept()
+        except OSError:
+            return True
+        _Query(self, connection)
+        return True
+
+    def _answer(self, request):
+        if "service" not in request:
+            return {"services": {name: series.paths for name, series in self.series.items()}}
+        series = self.series[request["service"]]
+        step, rows = series.query(request["path"], request.get("start", 0), request.get("end", 2 ** 32),
+                                  request.get("step"))
+        return {"step": step, "rows": [(t, round(low, 4), round(high, 4), round(mean, 4)) for t, low, high, mean in rows]}
+
+    def close(self):
+        self.socket.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class _Query(object):
+    """
+    One connection to the SeriesServer: reads until the newline, then writes the answer as far as the
+    client takes it every time and closes. Gives up on a client that takes longer than the server's
+    timeout for all of it.
+    """
+    max_request = 4096
+
+    def __init__(self, server, connection):
+        self.server = server
+        self.connection = connection
+        self.request = b""
+        self.answer = None
+        connection.setblocking(False)
+        self.watch = GLib.io_add_watch(connection.fileno(), GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._read)
+        self.timer = GLib.timeout_add_seconds(server.timeout, self._timeout)
+
+    def _read(self, fd, condition):
+        try:
+            data = self.connection.recv(self.max_request)
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            return self._close(f"series query went away: {e}")
+        if not data:
+            return self._close("series query went away before its request")
+        self.request += data
+        if b"\n" not in self.request:
+            if len(self.request) > self.max_request:
+                return self._close("series query without a newline, dropped")
+            return True
+
+        try:
+            answer = self.server._answer(json.loads(self.request.split(b"\n", 1)[0]))
+        except (ValueError, KeyError, TypeError) as e:
+            answer = {"error": f"{type(e).__name__}: {e}"}
+        self.answer = memoryview(json.dumps(answer).encode() + b"\n")
+        self.watch = GLib.io_add_watch(fd, GLib.IO_OUT | GLib.IO_HUP | GLib.IO_ERR, self._write)
+        return False
+
+    def _write(self, fd, condition):
+        try:
+            sent = self.connection.send(self.answer)
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            return self._close(f"series query went away: {e}")
+        self.answer = self.answer[sent:]
+        if len(self.answer):
+            return True
+        return self._close()
+
+    def _timeout(self):
+        self.timer = None
+        GLib.source_remove(self.watch)
+        self._close("series query timed out")
+        return False
+
+    def _close(self, reason=None):
+        if reason is not None:
+            logger.debug(reason)
+        if self.timer is not None:
+            GLib.source_remove(self.timer)
+            self.timer = None
+        self.connection.close()
+        return False
@@ -0,0 +1,125 @@
+import math
+import mmap
+import os
+import struct
+import time
+
+# the fields of one day, the same names as the /History/Daily/<day>/ paths
+day_fields = ("Yield", "MaxPower", "MaxPvVoltage", "MinBatteryVoltage", "MaxBatteryVoltage", "MaxBatteryCurrent")
+# the all time values, the /History/Overall/ paths
+overall_fields = ("MaxPvVoltage", "MaxBatteryVoltage", "MinBatteryVoltage")
+
+store_magic = b"MS48"
+store_version = 1
+# magic, version, number of days in the ring, then the overall values
+header = struct.Struct("<4sHH" + "d" * len(overall_fields))
+overall_block = struct.Struct("<" + "d" * len(overall_fields))
+overall_offset = header.size - overall_block.size
+# date (days since 0001-01-01, 0 for a free slot), then the day fields
+record = struct.Struct("<I" + "d" * len(day_fields))
+
+
+class HistoryStore(object):
+    """
+    Keeps the history the controller forgets (or never had, like the max pv voltage and the max
+    battery current of a day) in a small file under /data, so a restart doesn't take it away.
+
+    The file is a fixed size ring of day records, the record of a date sits in slot
+    date % days and is only valid if the date in it matches. It is memory mapped, so reading
+    it back at startup is a handful of struct unpacks. Values that aren't known are stored as
+    nan and come back as None.
+
+    Changes are kept in memory and only written into the map (and synced to the sd card) by
+    flush(), which does nothing until flush_interval seconds went by since the last write, unless
+    forced (day rollover, shutdown).
+    """
+    def __init__(self, path, days=365, flush_interval=600, clock=time.monotonic):
+        self.path = path
+        self.days = days
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._pending = {}      # {date ordinal: {field: value}}
+        self._overall = None    # {field: value} when it changed
+        self._last_flush = clock()
+
+        size = header.size + days * record.size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = os.fstat(fd).st_size != size
+            if fresh:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, version, ring = header.unpack_from(self._map, 0)[:3]
+        if fresh or magic != store_magic or version != store_version or ring != days:
+            # new file or one we don't understand, start over
+            self._map[:] = bytes(size)
+            header.pack_into(self._map, 0, store_magic, store_version, days, *([math.nan] * len(overall_fields)))
+            self._map.flush()
+
+    def day(self, date):
+        """{field: value} of a datetime.date, None if we don't have it"""
+        ordinal = date.toordinal()
+        if ordinal in self._pending:
+            return dict(self._pending[ordinal])
+        values = record.unpack_from(self._map, self._offset(ordinal))
+        if values[0] != ordinal:
+            return None
+        return {name: _value(v) for name, v in zip(day_fields, values[1:])}
+
+    def set_day(self, date, values):
+        """store (some of) the fields of a day"""
+        current = self.day(date) or dict.fromkeys(day_fields)
+        updated = dict(current, **values)
+        if updated != current:
+            self._pending[date.toordinal()] = updated
+
+    def overall(self):
+        """{field: value} of the all time values"""
+        if self._overall is not None:
+            return dict(self._overall)
+        values = header.unpack_from(self._map, 0)[3:]
+        return {name: _value(v) for name, v in zip(overall_fields, values)}
+
+    def set_overall(self, values):
+        current = self.overall()
+        updated = dict(current, **values)
+        if updated != current:
+            self._overall = updated
+
+    def flush(self, force=False):
+        """write what changed to the file, at most once every flush_interval unless forced"""
+        if not self._pending and self._overall is None:
+            return False
+        now = self.clock()
+        if not force and now - self._last_flush < self.flush_interval:
+            return False
+
+        for ordinal, values in self._pending.items():
+            record.pack_into(self._map, self._offset(ordinal), ordinal, *[_stored(values[name]) for name in day_fields])
+        if self._overall is not None:
+            overall_block.pack_into(self._map, overall_offset, *[_stored(self._overall[name]) for name in overall_fields])
+        self._map.flush()
+        self._pending = {}
+        self._overall = None
+        self._last_flush = now
+        return True
+
+    def close(self):
+        self.flush(force=True)
+        self._map.close()
+
+    def _offset(self, ordinal):
+        return header.size + (ordinal % self.days) * record.size
+
+
+def _value(v):
+    return None if math.isnan(v) else v
+
+
+def _stored(v):
+    return math.nan if v is None else v
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the worker talks to a pseudo terminal instead of a serial port, the driver logs to
+#    /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import os
+import struct
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+import acquisition  # noqa: E402
+from acquisition import AcquisitionWorker  # noqa: E402
+from rtu import crc16  # noqa: E402
+
+pdu_addresses = {"power_gen_day": {"reg": 267, "len": 1}, "uptime": {"reg": 271, "len": 1}}
+poll_groups = {"fast": {"entries": ["power_gen_day", "uptime"], "period": 1}}
+
+
+def _frame(data):
+    crc = crc16(data)
+    return bytes(data) + bytes((crc & 0xFF, crc >> 8))
+
+
+def _no_history(read_registers):
+    # HistoryReader.read of a controller without any days
+    return []
+    yield
+
+
+class AcquisitionWorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.worker = AcquisitionWorker(os.ttyname(slave))
+        os.close(slave)
+        # the snapshots are handed over right away instead of on the main loop
+        patcher = mock.patch.object(acquisition.GLib, "idle_add",
+                                    side_effect=lambda callback, *args: callback(*args))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.snapshots = []
+
+    def tearDown(self):
+        self.worker.controller.close()
+        os.close(self.master)
+
+    def _add_device(self, address, groups=poll_groups):
+        return self.worker.add_device(address, pdu_addresses, groups,
+                                      lambda snapshot: self.snapshots.append((address, snapshot)))
+
+    def _answer(self, address, uptime):
+        # the slave end of the line, answers one read with 205Wh today and the uptime
+        def slave():
+            reg, count = struct.unpack(">HH", os.read(self.master, 8)[2:6])
+            words = [{267: 205, 271: uptime}.get(reg + i, 0) for i in range(count)]
+            os.write(self.master, _frame(struct.pack(f">BBB{count}H", address, 3, 2 * count, *words)))
+        thread = threading.Thread(target=slave)
+        thread.start()
+        return thread
+
+    def test_cycle(self):
+        self._add_device(1)
+        thread = self._answer(1, 51)
+        self.worker._cycle()
+        thread.join()
+        [(address, snapshot)] = self.snapshots
+        self.assertIsNone(snapshot.error)
+        self.assertEqual(snapshot.registers["uptime"], (51,))
+        self.assertEqual(snapshot.rollover, 0)
+
+    def test_failing_device(self):
+        broken = self._add_device(1)
+        broken.scheduler.due = mock.Mock(side_effect=RuntimeError("bug"))
+        self._add_device(2)
+        thread = self._answer(2, 51)
+        # the other device is read all the same, and the broken one still sends its snapshot
+        self.worker._cycle()
+        thread.join()
+        snapshots = dict(self.snapshots)
+        self.assertEqual(snapshots[1].error, "bug")
+        self.assertIsNone(snapshots[2].error)
+        self.assertEqual(snapshots[2].registers["uptime"], (51,))
+
+    def test_rollover(self):
+        device = self._add_device(1, dict(poll_groups, history={"history": "all", "policy": "event"}))
+        device.history.read = mock.Mock(side_effect=_no_history)
+        for uptime in (51, 53):
+            device.scheduler.trigger("fast")
+            thread = self._answer(1, uptime)
+            self.worker._cycle()
+            thread.join()
+        # the new days are told once, and the history (an event group, read at startup only) was read
+        #    again in the same cycle
+        self.assertEqual([snapshot.rollover for address, snapshot in self.snapshots], [0, 2])
+        self.assertEqual(device.history.read.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
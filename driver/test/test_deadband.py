@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from deadband import DeadbandFilter  # noqa: E402
+
+paths = {
+    "/Dc/0/Current": {"value": None, "deadband": 0.05},
+    "/Pv/V": {"value": None, "deadband_rel": 0.01, "heartbeat": 60},
+    "/Pv/P": {"value": None, "deadband": 2, "deadband_rel": 0.02},
+    "/State": {"value": None},
+}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Service(object):
+    """what the filter needs of a VeDbusService: a batch that collects what it is given"""
+    def __init__(self):
+        self.values = {}
+        self.batches = []
+
+    def __enter__(self):
+        self.batches.append({})
+        return self
+
+    def __exit__(self, *exc):
+        self.values.update(self.batches[-1])
+
+    def __contains__(self, path):
+        return path in self.values
+
+    def __getitem__(self, path):
+        return self.values[path]
+
+    def __setitem__(self, path, value):
+        self.batches[-1][path] = value
+
+
+class DeadbandFilterTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.filter = DeadbandFilter(paths, clock=self.clock)
+
+    def _passes(self, path, *values):
+        return [self.filter.passes(path, value, self.clock()) for value in values]
+
+    def test_absolute(self):
+        # the band is measured from the last published value, not the last reading
+        self.assertEqual(self._passes("/Dc/0/Current", 1.0, 1.04, 0.96, 1.04, 1.06, 1.1, 1.12),
+                         [True, False, False, False, True, False, True])
+
+    def test_relative(self):
+        self.assertEqual(self._passes("/Pv/V", 40.0, 40.4, 39.6, 40.41), [True, False, False, True])
+        # 1% of what was published last, so the band moved with it
+        self.assertEqual(self._passes("/Pv/V", 40.81, 40.82), [False, True])
+
+    def test_larger_band(self):
+        # 2W below 100W, 2% above
+        self.assertEqual(self._passes("/Pv/P", 50, 52, 53), [True, False, True])
+        self.assertEqual(self._passes("/Pv/P", 200, 204, 205), [True, False, True])
+
+    def test_no_rule(self):
+        self.assertEqual(self._passes("/State", 3, 3, 3), [True, True, True])
+        self.assertEqual(self._passes("/Unknown", 1, 1), [True, True])
+
+    def test_heartbeat(self):
+        self.assertEqual(self._passes("/Pv/V", 40.0, 40.1), [True, False])
+        self.clock.now += 59
+        self.assertEqual(self._passes("/Pv/V", 40.1), [False])
+        # the drift goes out once the value was held back for a minute
+        self.clock.now += 1
+        self.assertEqual(self._passes("/Pv/V", 40.1, 40.2), [True, False])
+        # and a value that didn't move at all isn't sent again
+        self.clock.now += 60
+        self.assertEqual(self._passes("/Pv/V", 40.1), [False])
+
+    def test_no_heartbeat(self):
+        self.assertEqual(self._passes("/Dc/0/Current", 1.0), [True])
+        self.clock.now += 3600
+        self.assertEqual(self._passes("/Dc/0/Current", 1.01), [False])
+
+    def test_invalid(self):
+        # going to or from None always goes through, whatever the band
+        self.assertEqual(self._passes("/Dc/0/Current", None, None, 1.0, 1.01, None, 1.01),
+                         [True, True, True, False, True, True])
+        # as does anything that isn't a number
+        self.assertEqual(self._passes("/Dc/0/Current", "1.01", 1.01, True, 1.01), [True, True, True, True])
+
+    def test_batch(self):
+        service = Service()
+        with self.filter.batch(service) as s:
+            s["/Dc/0/Current"] = 1.0
+            s["/State"] = 3
+        self.assertEqual(service.values, {"/Dc/0/Current": 1.0, "/State": 3})
+
+        with self.filter.batch(service) as s:
+            s["/Dc/0/Current"] = 1.02
+            # held back, but read back in the same batch it is the value that was written
+            self.assertEqual(s["/Dc/0/Current"], 1.02)
+            self.assertEqual(s["/State"], 3)
+            self.assertIn("/State", s)
+        self.assertEqual(service.batches[-1], {})
+        self.assertEqual(service.values["/Dc/0/Current"], 1.0)
+
+        # the next batch reads the published value again
+        with self.filter.batch(service) as s:
+            self.assertEqual(s["/Dc/0/Current"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
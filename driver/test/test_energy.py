@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from energy import EnergyIntegrator  # noqa: E402
+
+
+class EnergyIntegratorTests(unittest.TestCase):
+    def test_trapezoid(self):
+        energy = EnergyIntegrator(max_gap=10)
+        energy.add(100.0, 0)
+        energy.add(101.0, 360)
+        # half of 360W for a second
+        self.assertAlmostEqual(energy.wh, 0.05)
+        for t in range(102, 3701):
+            energy.add(float(t), 360)
+        self.assertAlmostEqual(energy.wh, 0.05 + 0.1 * 3599)
+        self.assertEqual(energy.gap, 0)
+
+    def test_max_gap(self):
+        energy = EnergyIntegrator(max_gap=10)
+        energy.add(0.0, 720)
+        energy.add(10.0, 720)
+        self.assertAlmostEqual(energy.wh, 2.0)
+        # more than max_gap later, the time in between isn't counted
+        energy.add(21.0, 720)
+        self.assertAlmostEqual(energy.wh, 2.0)
+        self.assertEqual(energy.gap, 11)
+        # and the next trapezoid starts at the sample after the gap
+        energy.add(26.0, 0)
+        self.assertAlmostEqual(energy.wh, 2.5)
+
+    def test_unknown(self):
+        energy = EnergyIntegrator(max_gap=10)
+        energy.add(0.0, 720)
+        energy.add(5.0, None)
+        energy.add(10.0, 720)
+        energy.add(15.0, 720)
+        # the power wasn't known from 0 to 10
+        self.assertAlmostEqual(energy.wh, 1.0)
+        self.assertEqual(energy.gap, 10)
+
+    def test_clock(self):
+        energy = EnergyIntegrator(max_gap=10)
+        energy.add(10.0, 720)
+        # the same time twice, or going back, adds nothing
+        energy.add(10.0, 720)
+        energy.add(5.0, 720)
+        self.assertEqual((energy.wh, energy.gap), (0.0, 0.0))
+
+    def test_reset(self):
+        energy = EnergyIntegrator(max_gap=10)
+        energy.add(0.0, 720)
+        energy.add(5.0, 720)
+        energy.reset()
+        self.assertEqual((energy.wh, energy.gap), (0.0, 0.0))
+        # the next sample joins up with the one before the reset
+        energy.add(10.0, 720)
+        self.assertAlmostEqual(energy.wh, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from history import HistoryReader, history_base_reg  # noqa: E402
+from rtu import IllegalRequestError  # noqa: E402
+
+days = 30
+
+
+def _record(day):
+    return [100 + day, 0, 200 + day, 140 + day % 5, 120 + day % 5]
+
+
+class PlainController(object):
+    """the history as plain registers, the record of day n is the 5 registers from history_base_reg + n on"""
+    def __init__(self):
+        self.words = [1000 + i for i in range(days + 4)]
+        self.reads = []
+
+    def read(self, reg, count):
+        self.reads.append((reg, count))
+        return self.words[reg - history_base_reg:reg - history_base_reg + count]
+
+    def record(self, day):
+        return self.words[day:day + 5]
+
+
+class RecordController(object):
+    """a whole day record at every address, a bulk read gets the first word of every day"""
+    def __init__(self):
+        self.reads = []
+
+    def read(self, reg, count):
+        self.reads.append((reg, count))
+        day = reg - history_base_reg
+        if count == 5:
+            return _record(day)
+        return [_record(day + i)[0] if day + i < days else 0 for i in range(count)]
+
+
+class RefusingController(RecordController):
+    """refuses anything longer than a record"""
+    def read(self, reg, count):
+        if count != 5:
+            raise IllegalRequestError(2)
+        return RecordController.read(self, reg, count)
+
+
+def _run(generator):
+    # drives a read the way the worker does, counting the transactions
+    steps = 0
+    try:
+        while True:
+            next(generator)
+            steps += 1
+    except StopIteration as e:
+        return e.value, steps
+
+
+class HistoryReaderTests(unittest.TestCase):
+    def test_bulk(self):
+        controller = PlainController()
+        reader = HistoryReader(days, max_len=32)
+        records, steps = _run(reader.read(controller.read))
+        self.assertEqual(records, [controller.record(day) for day in range(days)])
+        self.assertTrue(reader.bulk)
+        # 34 registers in two reads, then the two days of the probe
+        self.assertEqual(controller.reads, [(1024, 32), (1056, 2), (1024, 5), (1025, 5)])
+        self.assertEqual(steps, 4)
+
+        # and from then on only the bulk reads
+        del controller.reads[:]
+        records, steps = _run(reader.read(controller.read))
+        self.assertEqual(records, [controller.record(day) for day in range(days)])
+        self.assertEqual(controller.reads, [(1024, 32), (1056, 2)])
+
+    def test_record_per_address(self):
+        controller = RecordController()
+        reader = HistoryReader(days, max_len=32)
+        records, steps = _run(reader.read(controller.read))
+        # the bulk read doesn't agree with day 1, the records are read one by one
+        self.assertEqual(records, [_record(day) for day in range(days)])
+        self.assertIs(reader.bulk, False)
+        self.assertEqual(controller.reads[:2], [(1024, 32), (1056, 2)])
+        self.assertEqual(controller.reads[2:], [(1024 + day, 5) for day in range(days)])
+
+        del controller.reads[:]
+        records, steps = _run(reader.read(controller.read))
+        self.assertEqual(records, [_record(day) for day in range(days)])
+        self.assertEqual(controller.reads, [(1024 + day, 5) for day in range(days)])
+        self.assertEqual(steps, days)
+
+    def test_refused_bulk(self):
+        controller = RefusingController()
+        reader = HistoryReader(days, max_len=32)
+        records, steps = _run(reader.read(controller.read))
+        self.assertEqual(records, [_record(day) for day in range(days)])
+        self.assertIs(reader.bulk, False)
+        self.assertEqual(controller.reads, [(1024 + day, 5) for day in range(days)])
+
+    def test_read_today(self):
+        controller = RecordController()
+        records, steps = _run(HistoryReader(days).read_today(controller.read))
+        self.assertEqual(records, _record(0))
+        self.assertEqual(controller.reads, [(1024, 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+import link  # noqa: E402
+from link import LinkMonitor  # noqa: E402
+from acquisition import Snapshot  # noqa: E402
+
+
+class Device(object):
+    def __init__(self):
+        self.address = 1
+        self.mode = "full"
+        self.resyncs = 0
+
+    def resync(self):
+        self.resyncs += 1
+
+
+class LinkMonitorTests(unittest.TestCase):
+    def setUp(self):
+        # the timers are kept instead of started, _fire runs the one that is due
+        self.timers = []
+        patcher = mock.patch.object(link.GLib, "timeout_add",
+                                    side_effect=lambda interval, callback: self.timers.append((interval, callback)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device()
+        self.changes = []
+        self.monitor = LinkMonitor(self.device, self.changes.append)
+
+    def _report(self, error=None):
+        return self.monitor.report(Snapshot(0, {}, error, 0.1, self.device.mode, 0))
+
+    def _fire(self):
+        interval, callback = self.timers.pop(0)
+        self.assertFalse(callback()) # a timer of its own every time
+        return interval
+
+    def _down(self):
+        for i in range(3):
+            self.assertFalse(self._report("timeout"))
+
+    def test_connected(self):
+        self.assertTrue(self._report())
+        # a failure or two doesn't take the link down
+        self.assertFalse(self._report("timeout"))
+        self.assertFalse(self._report("timeout"))
+        self.assertTrue(self._report())
+        self.assertEqual(self.monitor.state, "connected")
+        self.assertEqual(self.changes, [])
+        self.assertEqual(self.timers, [])
+        # only a full read is published, a probe isn't worth it
+        self.device.mode = "probe"
+        self.assertFalse(self._report())
+
+    def test_down(self):
+        self.assertFalse(self._report("timeout"))
+        self.assertFalse(self._report("timeout"))
+        self.assertEqual(self.changes, [])
+        self.assertFalse(self._report("timeout"))
+        self.assertEqual(self.monitor.state, "down")
+        self.assertEqual(self.device.mode, "idle")
+        self.assertEqual(self.changes, [False])
+        self.assertEqual([interval for interval, callback in self.timers], [2000])
+        # what the worker still had going is left alone
+        self.assertFalse(self._report())
+        self.assertFalse(self._report("timeout"))
+        self.assertEqual(self.changes, [False])
+
+    def test_backoff(self):
+        self._down()
+        intervals = [self._fire()]
+        for i in range(10):
+            self.assertEqual(self.monitor.state, "probing")
+            self.assertEqual(self.device.mode, "probe")
+            self.assertFalse(self._report("timeout"))
+            intervals.append(self._fire())
+        self.assertEqual(intervals, [2000, 4000, 8000, 16000, 32000, 64000, 128000, 256000, 300000, 300000, 300000])
+        # still down the whole time, that is one change only
+        self.assertEqual(self.changes, [False])
+
+    def test_back(self):
+        self._down()
+        self._fire()
+        self.assertFalse(self._report("timeout"))
+        self._fire()
+        # a full read from before the probe doesn't count
+        self.device.mode = "full"
+        self.assertFalse(self._report())
+        self.device.mode = "probe"
+
+        # the probe answers, everything is read again on the next cycle
+        self.assertFalse(self._report())
+        self.assertEqual(self.monitor.state, "connected")
+        self.assertEqual(self.device.mode, "full")
+        self.assertEqual(self.device.resyncs, 1)
+        self.assertEqual(self.changes, [False, True])
+        self.assertTrue(self._report())
+        self.assertEqual(self.changes, [False, True])
+
+        # and the back-off starts over
+        self._down()
+        self.assertEqual(self._fire(), 2000)
+        self.assertEqual(self.changes, [False, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from registermap import RegisterPlanner, RegisterBlock  # noqa: E402
+
+pdu_addresses = {
+    "battery_voltage": {"reg": 257, "len": 1},
+    "solar_current": {"reg": 258, "len": 1},
+    "solar_power": {"reg": 260, "len": 1},
+    "temperatures": {"reg": 261, "len": 1},
+    "uptime": {"reg": 271, "len": 1},
+    "total_power_generation": {"reg": 272, "len": 2},
+    "battery_type": {"reg": 320, "len": 1},
+    "0hist": {"reg": 1024, "len": 5, "coalesce": False},
+    "0dhist": {"reg": 1024, "len": 5, "coalesce": False},
+    "1hist": {"reg": 1025, "len": 5, "coalesce": False},
+}
+
+
+def _blocks(blocks):
+    # the members in register order, names that share the registers by name
+    return [(b.reg, b.len, sorted(b.members, key=lambda m: (m[1], m[0]))) for b in blocks]
+
+
+class RegisterPlannerTests(unittest.TestCase):
+    def test_merges_within_gap(self):
+        planner = RegisterPlanner(pdu_addresses, max_gap=4, max_len=32)
+        blocks = planner.plan(["battery_voltage", "solar_current", "solar_power", "temperatures"])
+        self.assertEqual(_blocks(blocks), [(257, 5, [("battery_voltage", 0, 1), ("solar_current", 1, 1),
+                                                     ("solar_power", 3, 1), ("temperatures", 4, 1)])])
+
+    def test_splits_on_gap(self):
+        # 262..270 is a gap of 9, more than we want to read for nothing
+        planner = RegisterPlanner(pdu_addresses, max_gap=4, max_len=32)
+        blocks = planner.plan(["temperatures", "uptime", "total_power_generation"])
+        self.assertEqual(_blocks(blocks), [(261, 1, [("temperatures", 0, 1)]),
+                                           (271, 3, [("uptime", 0, 1), ("total_power_generation", 1, 2)])])
+        # unless we are willing to
+        planner = RegisterPlanner(pdu_addresses, max_gap=9, max_len=32)
+        self.assertEqual(_blocks(planner.plan(["temperatures", "uptime"])), [(261, 11, [("temperatures", 0, 1), ("uptime", 10, 1)])])
+
+    def test_max_len(self):
+        planner = RegisterPlanner(pdu_addresses, max_gap=100, max_len=16)
+        blocks = planner.plan(["battery_voltage", "uptime", "total_power_generation"])
+        # 257..273 is 17 registers, one too many for all three
+        self.assertEqual(_blocks(blocks), [(257, 15, [("battery_voltage", 0, 1), ("uptime", 14, 1)]),
+                                           (272, 2, [("total_power_generation", 0, 2)])])
+        # never more than modbus allows
+        self.assertEqual(RegisterPlanner(pdu_addresses, max_len=1000).max_len, 125)
+
+    def test_no_coalesce(self):
+        planner = RegisterPlanner(pdu_addresses, max_gap=100, max_len=125)
+        blocks = planner.plan(["0hist", "0dhist", "1hist", "battery_type"])
+        # overlapping, but every history address is a read of its own. the same registers under two
+        #    names are read once
+        self.assertEqual(_blocks(blocks), [(320, 1, [("battery_type", 0, 1)]),
+                                           (1024, 5, [("0dhist", 0, 5), ("0hist", 0, 5)]),
+                                           (1025, 5, [("1hist", 0, 5)])])
+
+    def test_refuse(self):
+        planner = RegisterPlanner(pdu_addresses, max_gap=4, max_len=32)
+        names = ["battery_voltage", "solar_current", "solar_power", "uptime"]
+        blocks = planner.plan(names)
+        self.assertIs(planner.plan(names), blocks) # cached
+        planner.refuse(blocks[0])
+        self.assertEqual(_blocks(planner.plan(names)), [(257, 1, [("battery_voltage", 0, 1)]),
+                                                        (258, 1, [("solar_current", 0, 1)]),
+                                                        (260, 1, [("solar_power", 0, 1)]),
+                                                        (271, 1, [("uptime", 0, 1)])])
+
+    def test_split(self):
+        block = RegisterBlock(271, 3, [("uptime", 0, 1), ("total_power_generation", 1, 2)])
+        self.assertEqual(block.split([51, 0, 8550]), {"uptime": [51], "total_power_generation": [0, 8550]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the client talks to a pseudo terminal instead of a serial port
+
+import os
+import struct
+import sys
+import threading
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from rtu import (ModbusRtuClient, TurnaroundEstimator, crc16, NoResponseError,  # noqa: E402
+                 InvalidResponseError, SlaveReportedException, IllegalRequestError)
+
+
+def _bitwise_crc16(data):
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for bit in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _frame(data):
+    # data plus its crc, low byte first
+    crc = crc16(data)
+    return bytes(data) + bytes((crc & 0xFF, crc >> 8))
+
+
+class Crc16Tests(unittest.TestCase):
+    def test_known_frame(self):
+        # read 10 holding registers from 0 of slave 1, straight from the modbus spec
+        self.assertEqual(crc16(bytes.fromhex("01030000000a")), 0xCDC5)
+
+    def test_table(self):
+        for data in (b"", b"\x00", b"\xff" * 7, bytes(range(256))):
+            self.assertEqual(crc16(data), _bitwise_crc16(data))
+
+    def test_length(self):
+        data = bytearray(bytes.fromhex("01030000000a") + b"junk")
+        self.assertEqual(crc16(data, 6), crc16(bytes.fromhex("01030000000a")))
+
+
+class TurnaroundEstimatorTests(unittest.TestCase):
+    def test_first_sample(self):
+        estimator = TurnaroundEstimator(0.2, 0.03, 1.0)
+        self.assertEqual(estimator.timeout(), 0.2)
+        # the deviation starts at half the first sample
+        estimator.sample(0.04)
+        self.assertEqual((estimator.srtt, estimator.rttvar), (0.04, 0.02))
+        self.assertAlmostEqual(estimator.timeout(), 0.04 + 4 * 0.02)
+
+    def test_update(self):
+        estimator = TurnaroundEstimator(0.2, 0.03, 1.0)
+        estimator.sample(0.04)
+        estimator.sample(0.08)
+        # rttvar from the srtt before this sample, then srtt
+        self.assertAlmostEqual(estimator.rttvar, 0.75 * 0.02 + 0.25 * 0.04)
+        self.assertAlmostEqual(estimator.srtt, 0.875 * 0.04 + 0.125 * 0.08)
+        self.assertAlmostEqual(estimator.timeout(), estimator.srtt + 4 * estimator.rttvar)
+        # a steady slave settles on its turnaround
+        for i in range(100):
+            estimator.sample(0.05)
+        self.assertAlmostEqual(estimator.srtt, 0.05, places=4)
+        self.assertLess(estimator.rttvar, 0.001)
+
+    def test_bounds(self):
+        estimator = TurnaroundEstimator(0.2, 0.03, 1.0)
+        estimator.sample(0.001)
+        self.assertEqual(estimator.timeout(), 0.03)
+        estimator = TurnaroundEstimator(0.2, 0.03, 1.0)
+        estimator.sample(0.5)
+        self.assertEqual(estimator.timeout(), 1.0)
+
+    def test_missed(self):
+        estimator = TurnaroundEstimator(0.2, 0.03, 1.0)
+        estimator.missed()
+        self.assertEqual(estimator.timeout(), 0.4)
+        estimator.missed()
+        estimator.missed()
+        self.assertEqual(estimator.timeout(), 1.0)
+        # an answer brings it back to what was learned
+        estimator.sample(0.04)
+        self.assertAlmostEqual(estimator.timeout(), 0.12)
+
+
+class ModbusRtuClientTests(unittest.TestCase):
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.client = ModbusRtuClient(os.ttyname(slave), timeout=0.05, max_timeout=0.1)
+        os.close(slave)
+
+    def tearDown(self):
+        self.client.close()
+        os.close(self.master)
+
+    def _decode(self, frame, count, address=1, functioncode=3):
+        # as if frame came in for a read of count registers
+        self.client._response[:len(frame)] = frame
+        return self.client._decode(address, functioncode, count, len(frame))
+
+    def test_decode(self):
+        self.assertEqual(self._decode(_frame(b"\x01\x03\x04\x00\x0c\x01\xa1"), 2), [12, 417])
+
+    def test_exception_frames(self):
+        with self.assertRaises(IllegalRequestError) as e:
+            self._decode(_frame(b"\x01\x83\x02"), 2)
+        self.assertEqual(e.exception.code, 2)
+        with self.assertRaises(SlaveReportedException) as e:
+            self._decode(_frame(b"\x01\x83\x06"), 2) # slave busy
+        self.assertNotIsInstance(e.exception, IllegalRequestError)
+        # an exception frame with more behind it is still an exception frame
+        with self.assertRaises(IllegalRequestError):
+            self._decode(_frame(b"\x01\x83\x02") + b"\x00\x00", 2)
+
+    def test_short_frames(self):
+        with self.assertRaises(NoResponseError):
+            self._decode(b"", 2)
+        with self.assertRaises(InvalidResponseError):
+            self._decode(_frame(b"\x01\x03\x04\x00\x0c"), 2)
+        with self.assertRaises(InvalidResponseError):
+            self._decode(b"\x01\x83", 2)
+
+    def test_bad_crc(self):
+        frame = bytearray(_frame(b"\x01\x03\x04\x00\x0c\x01\xa1"))
+        frame[4] ^= 0x01
+        with self.assertRaises(InvalidResponseError):
+            self._decode(frame, 2)
+        frame = bytearray(_frame(b"\x01\x83\x02"))
+        frame[-1] ^= 0xFF
+        with self.assertRaises(InvalidResponseError):
+            self._decode(frame, 2)
+
+    def test_wrong_slave(self):
+        with self.assertRaises(InvalidResponseError):
+            self._decode(_frame(b"\x02\x03\x04\x00\x0c\x01\xa1"), 2)
+        with self.assertRaises(InvalidResponseError):
+            self._decode(_frame(b"\x01\x04\x04\x00\x0c\x01\xa1"), 2) # another function code
+
+    def _answer(self, response):
+        # reads the request off the other end of the line and answers it
+        def slave():
+            self.request = os.read(self.master, 8)
+            os.write(self.master, response)
+        thread = threading.Thread(target=slave)
+        thread.start()
+        return thread
+
+    def test_read_registers(self):
+        thread = self._answer(_frame(b"\x01\x03\x06" + struct.pack(">3H", 51, 0, 8550)))
+        self.assertEqual(self.client.read_registers(1, 271, 3), [51, 0, 8550])
+        thread.join()
+        self.assertEqual(self.request, _frame(b"\x01\x03\x01\x0f\x00\x03"))
+
+    def test_no_response(self):
+        thread = self._answer(b"")
+        with self.assertRaises(NoResponseError):
+            self.client.read_registers(1, 271, 3)
+        thread.join()
+
+    def test_estimators(self):
+        # a miss backs off the estimator of that slave and register group only
+        thread = self._answer(b"")
+        with self.assertRaises(NoResponseError):
+            self.client.read_registers(1, 271, 3)
+        thread.join()
+        self.assertEqual(self.client.estimator(1, 271).timeout(), 0.1)
+        self.assertEqual(self.client.estimator(2, 271).timeout(), 0.05)
+        self.assertEqual(self.client.estimator(1, 257).timeout(), 0.05)
+
+        # key names the group instead of the register
+        thread = self._answer(b"")
+        with self.assertRaises(NoResponseError):
+            self.client.read_registers(1, 1024, 5, key="history")
+        thread.join()
+        self.assertEqual(self.client.estimator(1, "history").timeout(), 0.1)
+        self.assertEqual(self.client.estimator(1, 1024).timeout(), 0.05)
+
+        # an answer is a sample for its own estimator
+        thread = self._answer(_frame(b"\x01\x03\x06" + struct.pack(">3H", 51, 0, 8550)))
+        self.client.read_registers(1, 257, 3)
+        thread.join()
+        self.assertIsNotNone(self.client.estimator(1, 257).srtt)
+        self.assertIsNone(self.client.estimator(1, 271).srtt)
+        self.assertIs(self.client.estimator(1, 257), self.client.estimator(1, 257))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from scheduler import PollScheduler  # noqa: E402
+
+groups = {
+    "info": {"entries": ["sver", "hver"], "policy": "once"},
+    "fast": {"entries": ["battery_voltage", "solar_power"], "period": 1},
+    "medium": {"entries": ["battery_type"], "period": 10},
+    "history": {"entries": ["1hist", "2hist"], "policy": "event"},
+}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PollSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = PollScheduler(groups, clock=self.clock)
+
+    def _cycle(self):
+        # reads what is due, the way the worker does
+        due = self.scheduler.due()
+        self.scheduler.done(due)
+        return sorted(due)
+
+    def test_first_cycle(self):
+        self.assertEqual(self._cycle(), ["fast", "history", "info", "medium"])
+        self.assertEqual(self.scheduler.entries(["fast", "info"]), ["battery_voltage", "solar_power", "sver", "hver"])
+
+    def test_periods(self):
+        self._cycle()
+        self.clock.now += 1
+        self.assertEqual(self._cycle(), ["fast"])
+        for i in range(8):
+            self.clock.now += 1
+            self.assertEqual(self._cycle(), ["fast"])
+        self.clock.now += 1
+        self.assertEqual(self._cycle(), ["fast", "medium"])
+
+    def test_deadline_from_done(self):
+        # the next deadline is a period from when the group was read, not from when it was due
+        self._cycle()
+        self.clock.now += 5
+        self.assertEqual(self._cycle(), ["fast"])
+        self.clock.now += 5
+        self.assertEqual(self._cycle(), ["fast", "medium"])
+        self.clock.now += 9
+        self.assertEqual(self._cycle(), ["fast"])
+
+    def test_slack(self):
+        self._cycle()
+        # a timer that fires a bit early still reads the 1 second group
+        self.clock.now += 0.75
+        self.assertEqual(self._cycle(), ["fast"])
+        # but not much earlier than that
+        self.clock.now += 0.74
+        self.assertEqual(self._cycle(), [])
+        self.clock.now += 0.01
+        self.assertEqual(self._cycle(), ["fast"])
+
+    def test_once(self):
+        self._cycle()
+        for i in range(100):
+            self.clock.now += 1
+            self.assertNotIn("info", self._cycle())
+
+    def test_event(self):
+        self._cycle()
+        self.clock.now += 3600
+        self.assertEqual(self._cycle(), ["fast", "medium"])
+        self.scheduler.trigger("history")
+        self.assertEqual(self._cycle(), ["history"])
+        self.clock.now += 3600
+        self.assertEqual(self._cycle(), ["fast", "medium"])
+
+    def test_not_done(self):
+        # a group that wasn't read (the controller didn't answer) is due on the next cycle again
+        self.assertIn("info", self.scheduler.due())
+        self.clock.now += 1
+        self.assertIn("info", self.scheduler.due())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from series import Tier, TimeSeries  # noqa: E402
+
+t0 = 1789999200 # a whole hour
+
+
+class TierTests(unittest.TestCase):
+    def test_second(self):
+        tier = Tier(1, 10, 1)
+        # two values in the same second are one bucket, their mean is min and max as well
+        tier.add(t0, [1.0])
+        tier.add(t0, [3.0])
+        tier.add(t0 + 1, [4.0])
+        self.assertEqual(tier.query(0, t0, t0 + 10), [(t0, 2.0, 2.0, 2.0), (t0 + 1, 4.0, 4.0, 4.0)])
+        tier.add(t0 + 1, [5.0])
+        tier.add(t0 + 2, [6.0])
+        self.assertEqual(tier.query(0, t0, t0 + 10)[1:], [(t0 + 1, 4.5, 4.5, 4.5), (t0 + 2, 6.0, 6.0, 6.0)])
+
+    def test_bucket(self):
+        tier = Tier(60, 10, 1)
+        for s in range(60):
+            tier.add(t0 + s, [float(s % 7)])
+        # still open
+        self.assertEqual(tier.count, 0)
+        self.assertEqual(tier.query(0, t0, t0), [(t0, 0.0, 6.0, sum(s % 7 for s in range(60)) / 60)])
+        # and closed by the first value of the next minute
+        tier.add(t0 + 75, [1.5])
+        self.assertEqual(tier.count, 1)
+        # 2.9 as a float32
+        self.assertEqual(tier.query(0, t0, t0 + 120), [(t0, 0.0, 6.0, 2.9000000953674316), (t0 + 60, 1.5, 1.5, 1.5)])
+
+    def test_ring(self):
+        tier = Tier(60, 3, 1)
+        for minute in range(6):
+            tier.add(t0 + minute * 60, [float(minute)])
+        # the three last closed minutes and the open one
+        self.assertEqual(tier.oldest(), t0 + 2 * 60)
+        self.assertEqual([t for t, low, high, mean in tier.query(0, t0, t0 + 3600)],
+                         [t0 + 2 * 60, t0 + 3 * 60, t0 + 4 * 60, t0 + 5 * 60])
+        self.assertEqual([mean for t, low, high, mean in tier.query(0, t0 + 3 * 60, t0 + 4 * 60)], [3.0, 4.0])
+
+    def test_gap(self):
+        tier = Tier(60, 10, 2)
+        tier.add(t0, [1.0, None])
+        tier.add(t0 + 60, [None, None])
+        tier.add(t0 + 120, [2.0, 3.0])
+        tier.add(t0 + 180, [None, None])
+        # a minute without values isn't there, the other channel of it still is
+        self.assertEqual(tier.query(0, t0, t0 + 3600), [(t0, 1.0, 1.0, 1.0), (t0 + 120, 2.0, 2.0, 2.0)])
+        self.assertEqual(tier.query(1, t0, t0 + 3600), [(t0 + 120, 3.0, 3.0, 3.0)])
+        self.assertEqual(tier.count, 3)
+
+
+class TimeSeriesTests(unittest.TestCase):
+    def setUp(self):
+        self.series = TimeSeries(["/Pv/V", "/Pv/P"], [(1, 120), (60, 60)])
+        for s in range(600):
+            self.series.add(t0 + s, {"/Pv/V": 40.0, "/Pv/P": float(s // 60)})
+
+    def test_tiers(self):
+        # the seconds go back two minutes
+        step, rows = self.series.query("/Pv/P", t0 + 540, t0 + 600)
+        self.assertEqual(step, 1)
+        self.assertEqual(len(rows), 60)
+        # further back than that are the minutes
+        step, rows = self.series.query("/Pv/P", t0, t0 + 600)
+        self.assertEqual(step, 60)
+        self.assertEqual(rows, [(t0 + m * 60, float(m), float(m), float(m)) for m in range(10)])
+        # asked for at least a minute, whatever the seconds have
+        self.assertEqual(self.series.query("/Pv/P", t0 + 540, t0 + 600, step=60)[0], 60)
+        # nothing is that coarse, the coarsest it is
+        self.assertEqual(self.series.query("/Pv/P", t0 + 540, t0 + 600, step=3600)[0], 60)
+        # and nothing goes that far back, the coarsest one has the most
+        self.assertEqual(self.series.query("/Pv/V", t0 - 86400, t0 + 600)[0], 60)
+
+    def test_clock_back(self):
+        self.series.add(t0 + 300, {"/Pv/V": 41.0})
+        step, rows = self.series.query("/Pv/V", 0, t0 + 600)
+        self.assertEqual(rows, [(t0 + 300, 41.0, 41.0, 41.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
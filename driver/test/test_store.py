@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import datetime
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+from store import HistoryStore, day_fields, header  # noqa: E402
+from history import RolloverDetector  # noqa: E402
+
+day = datetime.date(2026, 6, 21)
+values = {"Yield": 1.25, "MaxPower": 248, "MaxPvVoltage": 44.1, "MinBatteryVoltage": 13.1,
+          "MaxBatteryVoltage": 14.7, "MaxBatteryCurrent": 12.5}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class HistoryStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "history", "ttyUSB1.bin")
+        self.clock = Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _open(self, days=30, flush_interval=600):
+        return HistoryStore(self.path, days=days, flush_interval=flush_interval, clock=self.clock)
+
+    def test_day(self):
+        store = self._open()
+        self.assertIsNone(store.day(day))
+        store.set_day(day, values)
+        self.assertEqual(store.day(day), values)
+        store.close()
+
+        store = self._open()
+        self.assertEqual(store.day(day), values)
+        self.assertIsNone(store.day(day - datetime.timedelta(days=1)))
+        store.close()
+
+    def test_ring(self):
+        store = self._open(days=30)
+        store.set_day(day, values)
+        store.flush(force=True)
+        # 30 days later is the same slot, the old day is gone
+        later = day + datetime.timedelta(days=30)
+        self.assertIsNone(store.day(later))
+        store.set_day(later, {"Yield": 2.5})
+        store.flush(force=True)
+        self.assertIsNone(store.day(day))
+        self.assertEqual(store.day(later), dict(dict.fromkeys(day_fields), Yield=2.5))
+        store.close()
+
+    def test_none(self):
+        store = self._open()
+        store.set_day(day, {"Yield": 1.25, "MaxPvVoltage": None})
+        store.set_overall({"MaxPvVoltage": 44.1})
+        store.close()
+        # not known is nan in the file and None again when read
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.assertTrue(math.isnan(struct.unpack_from("<d", data, header.size - 8)[0]))
+        store = self._open()
+        self.assertEqual(store.day(day), dict(dict.fromkeys(day_fields), Yield=1.25))
+        self.assertEqual(store.overall(), {"MaxPvVoltage": 44.1, "MaxBatteryVoltage": None, "MinBatteryVoltage": None})
+        store.close()
+
+    def test_flush_budget(self):
+        store = self._open(flush_interval=600)
+        store.set_day(day, values)
+        # not written before the interval is over
+        self.clock.now += 599
+        self.assertFalse(store.flush())
+        self.clock.now += 1
+        self.assertTrue(store.flush())
+        # nothing to write, nothing written
+        self.clock.now += 600
+        self.assertFalse(store.flush())
+        # the same values again aren't a change
+        store.set_day(day, values)
+        self.assertFalse(store.flush(force=True))
+        # and forced goes whenever
+        store.set_day(day, {"Yield": 1.5})
+        self.assertTrue(store.flush(force=True))
+        store.set_overall({"MaxPvVoltage": 45.0})
+        self.assertFalse(store.flush())
+        store.close()
+
+    def test_unflushed_lost(self):
+        store = self._open()
+        store.set_day(day, values)
+        store._map.close() # killed before the flush
+        store = self._open()
+        self.assertIsNone(store.day(day))
+        store.close()
+
+    def test_other_ring(self):
+        store = self._open(days=30)
+        store.set_day(day, values)
+        store.close()
+        # a ring of another size doesn't line up, start over
+        store = self._open(days=31)
+        self.assertIsNone(store.day(day))
+        store.close()
+
+
+class RolloverDetectorTests(unittest.TestCase):
+    def _registers(self, uptime, power_gen_day):
+        return {"uptime": [uptime], "power_gen_day": [power_gen_day]}
+
+    def test_rollover(self):
+        detector = RolloverDetector()
+        self.assertEqual(detector.check(self._registers(5, 100)), 0)
+        self.assertEqual(detector.check(self._registers(5, 150)), 0)
+        # the yield of the day starts over at dawn
+        self.assertEqual(detector.check(self._registers(5, 0)), 1)
+        self.assertEqual(detector.check(self._registers(6, 10)), 1)
+        # the controller was reset
+        self.assertEqual(detector.check(self._registers(0, 10)), 1)
+
+    def test_from_last_run(self):
+        detector = RolloverDetector(uptime=5, power_gen_day=300)
+        self.assertEqual(detector.check(self._registers(8, 20)), 3)
+        detector = RolloverDetector(uptime=5, power_gen_day=300)
+        self.assertEqual(detector.check(self._registers(5, 300)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# run from this directory: python3 -m unittest
+#    the driver logs to /data/log/dbus-ms4840 (see utils.py), so that has to exist
+
+import datetime
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "../"))
+import warmstart  # noqa: E402
+
+state = {"day0": "2026-06-21", "rollover": {"uptime": 51, "power_gen_day": 205},
+         "values": {"/ProductName": "MS-4840N", "/History/Daily/1/Yield": 0.21}}
+
+
+def _driver():
+    # dbus-ms4840.py isn't a module name python can import
+    path = os.path.join(os.path.dirname(__file__), "../dbus-ms4840.py")
+    spec = importlib.util.spec_from_file_location("dbus_ms4840", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class WarmStartTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "ttyUSB1.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, data):
+        with open(self.path, "w") as f:
+            f.write(data)
+
+    def test_round_trip(self):
+        self.assertTrue(warmstart.save(self.path, state))
+        self.assertEqual(warmstart.load(self.path), state)
+        self.assertEqual(os.listdir(self.dir), ["ttyUSB1.json"])
+
+    def test_missing(self):
+        self.assertEqual(warmstart.load(self.path), {})
+
+    def test_bad_file(self):
+        whole = json.dumps(state)
+        for data in (whole[:len(whole) // 2], "", "\0" * 64, "[1, 2]", "null"):
+            self._write(data)
+            self.assertEqual(warmstart.load(self.path), {}, data)
+
+    def test_all_or_nothing(self):
+        warmstart.save(self.path, state)
+        # killed before the rename, the old state is still there
+        with mock.patch.object(warmstart.os, "replace", side_effect=OSError("killed")):
+            self.assertFalse(warmstart.save(self.path, {"day0": "2026-06-22"}))
+        self.assertEqual(warmstart.load(self.path), state)
+        # and the next save goes over what was left of the temporary file
+        self.assertTrue(warmstart.save(self.path, {"day0": "2026-06-22"}))
+        self.assertEqual(warmstart.load(self.path), {"day0": "2026-06-22"})
+        self.assertEqual(os.listdir(self.dir), ["ttyUSB1.json"])
+
+    def test_unwritable(self):
+        self.assertFalse(warmstart.save(os.path.join(self.dir, "gone", "ttyUSB1.json"), state))
+
+
+class DriverWarmStartTests(unittest.TestCase):
+    """MS4840._warm_start on its own, without a dbus service"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.driver = _driver()
+        self.controller = self.driver.MS4840.__new__(self.driver.MS4840)
+        self.controller.warm_path = os.path.join(self.dir, "ttyUSB1.json")
+        self.controller.store = None
+        self.controller.device = types.SimpleNamespace(rollover=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _start(self, data):
+        with open(self.controller.warm_path, "w") as f:
+            f.write(data)
+        return self.controller._warm_start()
+
+    def test_state(self):
+        today = datetime.date.today()
+        values = self._start(json.dumps(dict(state, day0=today.isoformat())))
+        self.assertEqual(values, state["values"])
+        self.assertEqual(self.controller.day0, today)
+        self.assertEqual((self.controller.device.rollover.uptime, self.controller.device.rollover.power_gen_day),
+                         (51, 205))
+
+    def test_bad_state(self):
+        # whatever is in the file, the driver starts (cold, if need be)
+        self.assertEqual(self._start(json.dumps(dict(state, values=[1]))), {})
+        for data in ("{", "[]", json.dumps(dict(state, day0=5)),
+                     json.dumps(dict(state, day0="yesterday")), json.dumps(dict(state, rollover="x")),
+                     json.dumps(dict(state, rollover={"uptime": "51", "power_gen_day": 205})),
+                     json.dumps(dict(state, rollover={"uptime": 51}))):
+            values = self._start(data)
+            self.assertNotIn("/History/Daily/1/Yield", values, data)
+            self.assertIsNotNone(self.controller.day0)
+            self.assertIsNone(self.controller.device.rollover.uptime, data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+
+# compares the memory and cpu use of the running dbus-ms4840 drivers, run it once with one
+#    driver process per port and once with all the ports in one process, for example
+#
+#    one process per port:
+#        python dbus-ms4840.py /dev/ttyUSB0 &  python dbus-ms4840.py /dev/ttyUSB1 &
+#    one process for all ports:
+#        python dbus-ms4840.py /dev/ttyUSB0 /dev/ttyUSB1 &
+#
+#    python usage-compare.py [seconds]
+#
+# rss counts the shared libraries in every process, pss splits them between the processes that
+#    map them, so the pss total is the honest number for "how much memory do the drivers take"
+
+import os
+import sys
+import time
+
+driver_name = "dbus-ms4840.py"
+
+
+def _driver_pids():
+    pids = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().split(b"\0")
+        except OSError:
+            continue
+        if any(arg.decode(errors="ignore").endswith(driver_name) for arg in cmdline):
+            pids.append((int(pid), b" ".join(cmdline).decode(errors="ignore").strip()))
+    return pids
+
+
+def _memory_kb(pid):
+    """returns (rss, pss) in kB"""
+    rss = pss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pss = rss
+    return rss, pss
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # the command can contain spaces, the fields we want come after the closing parenthesis
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK") # utime + stime
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    pids = _driver_pids()
+    if not pids:
+        print(f"no {driver_name} processes running")
+        return
+
+    start = {pid: _cpu_seconds(pid) for pid, cmdline in pids}
+    time.sleep(seconds)
+
+    total_rss = total_pss = total_cpu = 0
+    print("%-8s %10s %10s %8s  %s" % ("pid", "rss kB", "pss kB", "cpu %", "command"))
+    for pid, cmdline in pids:
+        rss, pss = _memory_kb(pid)
+        cpu = (_cpu_seconds(pid) - start[pid]) / seconds * 100
+        total_rss += rss
+        total_pss += pss
+        total_cpu += cpu
+        print("%-8d %10d %10d %8.2f  %s" % (pid, rss, pss, cpu, cmdline))
+    print("%-8s %10d %10d %8.2f  over %d seconds" % ("total", total_rss, total_pss, total_cpu, seconds))
+
+
+if __name__ == "__main__":
+    main()
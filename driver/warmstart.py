@@ -0,0 +1,34 @@
+import json
+import os
+from utils import logger
+
+
+def load(path):
+    """the state saved by save(), {} if there is none (first start, or a file we can't read)"""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"can't read {path}, starting cold: {e}")
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save(path, state):
+    """
+    writes state (anything json can take) to path, all of it or nothing: it goes to a temporary
+    file next to it first, which is synced and then renamed over the old one
+    """
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.error(f"can't write {path}: {e}")
+        return False
+    return True
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Runs a VeDbusService for test_vedbus.py, with one dbus object per path or with the
+# fallback object (fixture_vedbusservice.py fallback).
+
+from dbus.mainloop.glib import DBusGMainLoop
+import dbus
+import sys
+import os
+
+# our own packages
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from gi.repository import GLib
+from vedbus import VeDbusService
+
+def changerequest(path, newvalue):
+	return newvalue < 100
+
+def gettext(path, value):
+	return 'gettexted %s %s' % (path, value)
+
+def main(argv):
+		# Have a mainloop, so we can send/receive asynchronous calls to and from dbus
+		DBusGMainLoop(set_as_default=True)
+
+		service = VeDbusService('com.victronenergy.dbusexample', register=False,
+			fallback=len(argv) > 1 and argv[1] == 'fallback')
+
+		# Writing /Batch changes both /Group paths in one go, for the ItemsChanged signal
+		def batch(path, newvalue):
+			with service as s:
+				s['/Group/A'] = newvalue
+				s['/Group/B'] = newvalue * 2
+			return True
+
+		service.add_path('/String', 'this is a string')
+		service.add_path('/Int', 40000)
+		service.add_path('/Float', 1.5)
+		service.add_path('/Invalid', None)
+		service.add_path('/NotWriteable', 'original')
+		service.add_path('/WriteableUpTo100', 'original', writeable=True, onchangecallback=changerequest)
+		service.add_path('/Gettextcallback', 10, gettextcallback=gettext, writeable=True)
+		service.add_path('/Group/A', 1, gettextcallback=gettext)
+		service.add_path('/Group/B', 2.5)
+		service.add_path('/Batch', 0, writeable=True, onchangecallback=batch)
+		service.register()
+
+		mainloop = GLib.MainLoop()
+		print("up and running")
+		sys.stdout.flush()
+
+		mainloop.run()
+
+main(sys.argv)
@@ -12,10 +12,12 @@ import dbus
 import threading
 import fcntl
 from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
 
 # Local
 sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
-from vedbus import VeDbusService, VeDbusItemImport
+from vedbus import VeDbusService, VeDbusItemImport, VeDbusItemExport, VeDbusRootExport, VeDbusTreeHandlerExport
+from ve_utils import wrap_dbus_value, unwrap_dbus_value, dbus_value_wrapper, dbus_int_types, VEDBUS_INVALID
 
 logger = logging.getLogger(__file__)
 """
@@ -162,6 +164,459 @@ class VeDbusItemExportTests(unittest.TestCase):
 
 		thread.join()
 
+class VeDbusServiceExportTests(unittest.TestCase):
+	# Same idea as VeDbusItemExportTests, against a whole VeDbusService exporting a dbus object
+	# per path (and per node in between). fixture_vedbusservice.py runs the service.
+	fallback = False
+
+	def setUp(self):
+		args = [sys.executable, "fixture_vedbusservice.py"] + (['fallback'] if self.fallback else [])
+		self.sp = subprocess.Popen(args, stdout=subprocess.PIPE)
+		# a connection of our own, with a mainloop to get the signals on
+		self.dbusConn = dbus.SessionBus(private=True, mainloop=DBusGMainLoop()) \
+			if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True, mainloop=DBusGMainLoop())
+		# closed in tearDown, which must not take the test process with it when a later test runs the mainloop
+		self.dbusConn.set_exit_on_disconnect(False)
+
+		# the service registers with do_not_queue, the fixture quits if the name is still taken
+		line = None
+		while line != b'up and running':
+			line = self.sp.stdout.readline()
+			self.assertNotEqual(line, b'', "fixture_vedbusservice.py didn't start")
+			line = line.rstrip()
+
+		self.signals = []
+		for name in ('PropertiesChanged', 'ItemsChanged'):
+			self.dbusConn.add_signal_receiver(
+				lambda changes, path=None, member=None: self.signals.append((member, path, changes)),
+				signal_name=name, dbus_interface='com.victronenergy.BusItem',
+				bus_name='com.victronenergy.dbusexample', path_keyword='path', member_keyword='member')
+
+	def tearDown(self):
+		self.sp.kill()
+		self.sp.wait()
+		self.sp.stdout.close()
+		# wait for the bus to let go of the name, the next test registers it again
+		end = time.time() + 5
+		while self.dbusConn.name_has_owner('com.victronenergy.dbusexample') and time.time() < end:
+			time.sleep(0.01)
+		self.dbusConn.close()
+
+	def _object(self, path):
+		return self.dbusConn.get_object('com.victronenergy.dbusexample', path)
+
+	def _wait_for_signals(self, count, timeout=2):
+		context = GLib.MainContext.default()
+		end = time.time() + timeout
+		while len(self.signals) < count and time.time() < end:
+			if not context.iteration(False):
+				time.sleep(0.01)
+		# and anything that shouldn't have come
+		for i in range(10):
+			context.iteration(False)
+
+	def test_get_value_items(self):
+		v = self._object('/Int').GetValue()
+		self.assertEqual(v, 40000)
+		self.assertIs(type(v), dbus.Int32)
+		v = self._object('/Float').GetValue()
+		self.assertEqual(v, 1.5)
+		self.assertIs(type(v), dbus.Double)
+		v = self._object('/Invalid').GetValue()
+		self.assertEqual(v, dbus.Array([], signature=dbus.Signature('i'), variant_level=1))
+		self.assertEqual(self._object('/String').GetValue(), 'this is a string')
+
+	def test_get_text_items(self):
+		self.assertEqual(self._object('/Int').GetText(), '40000')
+		self.assertEqual(self._object('/Invalid').GetText(), '---')
+		self.assertEqual(self._object('/Gettextcallback').GetText(), 'gettexted /Gettextcallback 10')
+
+	def test_get_value_node(self):
+		self.assertEqual(self._object('/Group').GetValue(), {'A': 1, 'B': 2.5})
+		self.assertEqual(self._object('/Group').GetText(), {'A': 'gettexted /Group/A 1', 'B': '2.5'})
+		v = self._object('/').GetValue()
+		self.assertEqual(v['Group/A'], 1)
+		self.assertEqual(v['String'], 'this is a string')
+		self.assertEqual(len(v), 10)
+
+	def test_get_items(self):
+		items = self._object('/').GetItems()
+		self.assertEqual(len(items), 10)
+		self.assertEqual(items['/Group/A'], {'Value': 1, 'Text': 'gettexted /Group/A 1'})
+		self.assertEqual(items['/Invalid']['Text'], '---')
+
+	def test_set_value(self):
+		self.assertNotEqual(0, self._object('/NotWriteable').SetValue(12))
+		self.assertEqual('original', self._object('/NotWriteable').GetValue())
+
+		self.assertNotEqual(0, self._object('/WriteableUpTo100').SetValue(102))
+		self.assertEqual('original', self._object('/WriteableUpTo100').GetValue())
+
+		self.assertEqual(0, self._object('/WriteableUpTo100').SetValue(50))
+		self.assertEqual(50, self._object('/WriteableUpTo100').GetValue())
+		self.assertEqual(50, self._object('/').GetItems()['/WriteableUpTo100']['Value'])
+
+	def test_set_value_node(self):
+		with self.assertRaises(dbus.exceptions.DBusException):
+			self._object('/Group').SetValue(1)
+
+	def test_unknown_path(self):
+		with self.assertRaises(dbus.exceptions.DBusException):
+			self._object('/Nothing/Here').GetValue()
+
+	def test_properties_changed(self):
+		self.assertEqual(0, self._object('/Gettextcallback').SetValue(60))
+		self._wait_for_signals(1)
+		self.assertEqual(self.signals, [('PropertiesChanged', '/Gettextcallback',
+			{'Value': 60, 'Text': 'gettexted /Gettextcallback 60'})])
+
+	def test_items_changed(self):
+		# the writes in the with block go out as one ItemsChanged from /, after the
+		# PropertiesChanged of /Batch itself
+		self.assertEqual(0, self._object('/Batch').SetValue(3))
+		self._wait_for_signals(2)
+		self.assertEqual(sorted(self.signals), [
+			('ItemsChanged', '/', {
+				'/Group/A': {'Value': 3, 'Text': 'gettexted /Group/A 3'},
+				'/Group/B': {'Value': 6, 'Text': '6'}}),
+			('PropertiesChanged', '/Batch', {'Value': 3, 'Text': '3'})])
+
+class VeDbusServiceFallbackExportTests(VeDbusServiceExportTests):
+	# The same, with the fallback object answering for every path
+	fallback = True
+
+	def test_introspect(self):
+		xml = self._object('/').Introspect(dbus_interface=dbus.INTROSPECTABLE_IFACE)
+		self.assertIn('<node name="Group"/>', xml)
+		self.assertIn('<node name="String"/>', xml)
+		xml = self._object('/Group').Introspect(dbus_interface=dbus.INTROSPECTABLE_IFACE)
+		self.assertIn('<node name="A"/>', xml)
+		self.assertNotIn('<node name="String"/>', xml)
+
+class VeDbusServiceLocalTests(unittest.TestCase):
+	# A VeDbusService in the test process itself, on a connection of its own that doesn't own a
+	# name. These look at what the service keeps and at the signals it sends, which are recorded
+	# instead of sent.
+
+	def setUp(self):
+		self.dbusConn = dbus.SessionBus(private=True, mainloop=DBusGMainLoop()) \
+			if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True, mainloop=DBusGMainLoop())
+		self.dbusConn.set_exit_on_disconnect(False)
+		self.service = VeDbusService('com.victronenergy.testservice', bus=self.dbusConn, register=False)
+
+		self.signals = []
+		self._signals = {}
+		for cls, name in ((VeDbusItemExport, 'PropertiesChanged'), (VeDbusRootExport, 'ItemsChanged')):
+			self._signals[cls, name] = getattr(cls, name)
+			setattr(cls, name, lambda obj, changes, name=name:
+				self.signals.append((name, obj.__dbus_object_path__, dict(changes))))
+
+	def tearDown(self):
+		for (cls, name), signal in self._signals.items():
+			setattr(cls, name, signal)
+		self.service.__del__()
+		self.dbusConn.close()
+
+	def _add_paths(self, *paths):
+		for path in paths:
+			self.service.add_path(path, 0)
+
+	def test_subtree(self):
+		self._add_paths('/History/Daily/1/Yield', '/History/Daily/10/Yield', '/History/Daily/1/MaxPower',
+			'/History/Daily/2/Yield', '/History/Overall/DaysAvailable', '/Dc/0/Voltage')
+		subtree = list(self.service._subtree('/History/Daily/1'))
+		self.assertEqual([p for p, item in subtree], ['/History/Daily/1/MaxPower', '/History/Daily/1/Yield'])
+		for p, item in subtree:
+			self.assertIs(item, self.service._dbusobjects[p])
+		self.assertEqual(list(self.service._subtree('/History/Daily/1/')), subtree)
+		self.assertEqual([p for p, item in self.service._subtree('/History/Daily/10')], ['/History/Daily/10/Yield'])
+		self.assertEqual(list(self.service._subtree('/History/Daily/3')), [])
+		self.assertEqual([p for p, item in self.service._subtree('/')], sorted(self.service._dbusobjects))
+
+		# and a node answers for its own objects only
+		self.assertEqual(self.service._dbusnodes['/History/Daily/1'].GetValue(), {'MaxPower': 0, 'Yield': 0})
+
+	def test_children(self):
+		self._add_paths('/History/Daily/1/Yield', '/History/Daily/10/Yield', '/History/Daily/1/MaxPower',
+			'/History/Daily/2/Yield', '/History/Overall/DaysAvailable', '/Dc/0/Voltage')
+		self.assertEqual(self.service._children('/'), ['Dc', 'History'])
+		self.assertEqual(self.service._children('/History'), ['Daily', 'Overall'])
+		self.assertEqual(self.service._children('/History/Daily'), ['1', '10', '2'])
+		self.assertEqual(self.service._children('/History/Daily/1'), ['MaxPower', 'Yield'])
+		self.assertEqual(self.service._children('/Dc/0/Voltage'), [])
+
+	def test_del_tree_removes_nodes(self):
+		self._add_paths('/History/Daily/0/Yield', '/History/Daily/0/MaxPower', '/History/Daily/1/Yield', '/Dc/0/Voltage')
+		self.assertEqual(self.service._nodecounts['/History/Daily'], 3)
+		del self.signals[:]
+
+		with self.service as s:
+			s.del_tree('/History/Daily/0')
+		self.assertNotIn('/History/Daily/0', self.service._dbusnodes)
+		self.assertNotIn('/History/Daily/0', self.service._nodecounts)
+		self.assertEqual(self.service._nodecounts['/History/Daily'], 1)
+		self.assertEqual(self.service._nodecounts['/History'], 1)
+		self.assertIn('/History/Daily', self.service._dbusnodes)
+		self.assertEqual(self.service._paths, ['/Dc/0/Voltage', '/History/Daily/1/Yield'])
+		# the removed paths go out invalidated, in one signal
+		invalid = {'Value': dbus.Array([], signature=dbus.Signature('i'), variant_level=1), 'Text': '---'}
+		self.assertEqual(self.signals, [('ItemsChanged', '/',
+			{'/History/Daily/0/Yield': invalid, '/History/Daily/0/MaxPower': invalid})])
+
+	def test_delitem_removes_nodes(self):
+		self._add_paths('/History/Daily/1/Yield', '/Dc/0/Voltage')
+		del self.service['/History/Daily/1/Yield']
+		for node in ('/History', '/History/Daily', '/History/Daily/1'):
+			self.assertNotIn(node, self.service._dbusnodes)
+			self.assertNotIn(node, self.service._nodecounts)
+		self.assertEqual(self.service._nodecounts, {'/Dc': 1, '/Dc/0': 1})
+		self.assertEqual(sorted(self.service._dbusnodes), ['/', '/Dc', '/Dc/0'])
+		self.assertEqual(self.service._children('/'), ['Dc'])
+
+		# and they come back with a new path below them
+		self._add_paths('/History/Daily/1/Yield')
+		self.assertIn('/History/Daily/1', self.service._dbusnodes)
+		self.assertEqual(self.service._nodecounts['/History'], 1)
+
+	def _call(self, path, method):
+		# calls method on path of the service over the bus, from another connection, and runs
+		# the main loop (that the service answers from) until the reply is in
+		bus = dbus.SessionBus(private=True, mainloop=DBusGMainLoop()) \
+			if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True, mainloop=DBusGMainLoop())
+		bus.set_exit_on_disconnect(False)
+		replies = []
+		bus.call_async(self.dbusConn.get_unique_name(), path, 'com.victronenergy.BusItem', method, '', (),
+			lambda value: replies.append(value), lambda e: replies.append(e))
+		context = GLib.MainContext.default()
+		end = time.time() + 2
+		while not replies and time.time() < end:
+			if not context.iteration(False):
+				time.sleep(0.01)
+		bus.close()
+		if isinstance(replies[0], Exception):
+			raise replies[0]
+		return replies[0]
+
+	def test_tree_handler(self):
+		days = {'/History/Daily/5/Yield': 2.5, '/History/Daily/6/Yield': 0}
+		self.service.add_tree_handler('/History/Daily', days.get, lambda path, value: '%.1fkWh' % value)
+		self._add_paths('/History/Daily/0/Yield', '/History/Daily/1/Yield')
+		self.assertIsInstance(self.service._dbusnodes['/History/Daily'], VeDbusTreeHandlerExport)
+
+		# the paths below it that aren't added come from the handler, the added ones answer for themselves
+		self.assertEqual(self._call('/History/Daily/5/Yield', 'GetValue'), 2.5)
+		self.assertEqual(self._call('/History/Daily/5/Yield', 'GetText'), '2.5kWh')
+		self.assertEqual(self._call('/History/Daily/6/Yield', 'GetValue'), 0)
+		self.service['/History/Daily/1/Yield'] = 1.5
+		self.assertEqual(self._call('/History/Daily/1/Yield', 'GetValue'), 1.5)
+		self.assertEqual(self._call('/History/Daily', 'GetValue'), {'0/Yield': 0, '1/Yield': 1.5})
+		with self.assertRaises(dbus.exceptions.DBusException) as e:
+			self._call('/History/Daily/7/Yield', 'GetValue')
+		self.assertEqual(e.exception.get_dbus_name(), 'org.freedesktop.DBus.Error.UnknownObject')
+
+		# they aren't items of the service
+		self.assertNotIn('/History/Daily/5/Yield', self.service._get_items())
+		self.assertNotIn('/History/Daily/5/Yield', self.service)
+
+		# and the node stays when the paths below it are gone
+		with self.service as s:
+			s.del_tree('/History/Daily')
+		self.assertIn('/History/Daily', self.service._dbusnodes)
+		self.assertEqual(self._call('/History/Daily/5/Yield', 'GetValue'), 2.5)
+
+	def _items(self):
+		# what GetItems would return if it was built from scratch
+		return dict((path, {'Value': item.GetValue(), 'Text': item.GetText()})
+			for path, item in self.service._dbusobjects.items())
+
+	def test_get_items_snapshot(self):
+		self.service.add_path('/Int', 1)
+		self.service.add_path('/String', 'a', writeable=True)
+		root = self.service._dbusnodes['/']
+		items = root.GetItems()
+		self.assertEqual(items, {'/Int': {'Value': 1, 'Text': '1'}, '/String': {'Value': 'a', 'Text': 'a'}})
+		# nothing changed, the same copy again
+		self.assertIs(root.GetItems(), items)
+
+		# a local change, one over the bus and one in a ServiceContext
+		self.service['/Int'] = 2
+		self.assertEqual(0, self.service._dbusobjects['/String'].SetValue(dbus.String('b', variant_level=1)))
+		changed = root.GetItems()
+		self.assertEqual(changed, self._items())
+		self.assertEqual(changed['/Int'], {'Value': 2, 'Text': '2'})
+		self.assertEqual(changed['/String'], {'Value': 'b', 'Text': 'b'})
+		with self.service as s:
+			s['/Int'] = None
+		self.assertEqual(root.GetItems(), self._items())
+		# the copy handed out before isn't touched
+		self.assertEqual(items['/Int'], {'Value': 1, 'Text': '1'})
+
+		del self.service['/Int']
+		self.assertEqual(root.GetItems(), {'/String': {'Value': 'b', 'Text': 'b'}})
+
+		self.service.add_path('/Int', 3)
+		self.assertEqual(root.GetItems(), self._items())
+		self.assertEqual(root.GetItems()['/Int'], {'Value': 3, 'Text': '3'})
+
+	def _run_mainloop(self, seconds):
+		# the trailing signal of a rate limit comes from a GLib timer
+		context = GLib.MainContext.default()
+		end = time.time() + seconds
+		while time.time() < end:
+			if not context.iteration(False):
+				time.sleep(0.01)
+
+	def _values(self, changes):
+		return dict((path, c['Value']) for path, c in changes.items())
+
+	def test_signal_rate(self):
+		self.service.set_signal_rate('/History', 0.2)
+		self._add_paths('/History/A', '/History/B', '/Dc/V')
+
+		# the first change goes out right away, the next ones wait for the interval to be over
+		self.service['/History/A'] = 1
+		self.assertEqual(self.signals, [('PropertiesChanged', '/History/A', {'Value': 1, 'Text': '1'})])
+		self.service['/History/A'] = 2
+		self.service['/History/A'] = 3
+		self.service['/History/B'] = 1
+		self.assertEqual(len(self.signals), 1)
+		# the values are up to date all the same
+		self.assertEqual(self.service._dbusnodes['/'].GetItems()['/History/A']['Value'], 3)
+
+		# paths outside of the prefix aren't held back
+		self.service['/Dc/V'] = 1
+		self.assertEqual(self.signals[1:], [('PropertiesChanged', '/Dc/V', {'Value': 1, 'Text': '1'})])
+
+		# the latest value of every path at the end of the interval, in one go
+		self._run_mainloop(0.4)
+		self.assertEqual(len(self.signals), 3)
+		name, path, changes = self.signals[2]
+		self.assertEqual((name, path), ('ItemsChanged', '/'))
+		self.assertEqual(self._values(changes), {'/History/A': 3, '/History/B': 1})
+
+	def test_signal_rate_invalid(self):
+		self.service.set_signal_rate('/History', 0.2)
+		self._add_paths('/History/A', '/History/B')
+		self.service['/History/A'] = 1
+		self.service['/History/A'] = 2
+		self.service['/History/B'] = 1
+		del self.signals[:]
+
+		# an invalidation goes out right away, and the value it replaced isn't sent after it
+		self.service['/History/A'] = None
+		self.assertEqual(len(self.signals), 1)
+		self.assertEqual(self.signals[0][:2], ('PropertiesChanged', '/History/A'))
+		self.assertEqual(self.signals[0][2]['Text'], '---')
+		self._run_mainloop(0.4)
+		self.assertEqual(len(self.signals), 2)
+		self.assertEqual(self._values(self.signals[1][2]), {'/History/B': 1})
+
+	def test_signal_rate_removed(self):
+		self.service.set_signal_rate('/History', 0.2)
+		self._add_paths('/History/A')
+		self.service['/History/A'] = 1
+		self.service['/History/A'] = 2
+		# removing the limit sends what it held back
+		self.service.set_signal_rate('/History', None)
+		self.assertEqual(self._values(self.signals[-1][2]), {'/History/A': 2})
+		self.service['/History/A'] = 3
+		self.assertEqual(self.signals[-1], ('PropertiesChanged', '/History/A', {'Value': 3, 'Text': '3'}))
+
+	def test_signal_rate_per_prefix(self):
+		self.service.set_signal_rate('/History', 0.2)
+		self._add_paths('/History/A', '/History/B')
+		# the paths share one interval, the first change of another path is held back too
+		self.service['/History/A'] = 1
+		self.service['/History/B'] = 1
+		self.assertEqual(len(self.signals), 1)
+		self._run_mainloop(0.4)
+		self.assertEqual(self.signals[1][:2], ('ItemsChanged', '/'))
+		self.assertEqual(self._values(self.signals[1][2]), {'/History/B': 1})
+		# after a quiet interval the next change goes out right away again
+		self.service['/History/B'] = 2
+		self.assertEqual(self.signals[2], ('PropertiesChanged', '/History/B', {'Value': 2, 'Text': '2'}))
+
+	def test_signal_rate_deleted(self):
+		self.service.set_signal_rate('/History', 0.2)
+		self._add_paths('/History/A', '/History/B')
+		self.service['/History/A'] = 1
+		self.service['/History/A'] = 2
+		self.service['/History/B'] = 1
+		# deleting the service sends what was held back, nothing is lost
+		self.service.__del__()
+		self.assertEqual(self.signals[-1][:2], ('ItemsChanged', '/'))
+		self.assertEqual(self._values(self.signals[-1][2]), {'/History/A': 2, '/History/B': 1})
+		# and no timer is left to send it again
+		count = len(self.signals)
+		self._run_mainloop(0.4)
+		self.assertEqual(len(self.signals), count)
+
+def chain_unwrap_dbus_value(val):
+	# unwrap_dbus_value as it was before the type table
+	if isinstance(val, dbus_int_types):
+		return int(val)
+	if isinstance(val, dbus.Double):
+		return float(val)
+	if isinstance(val, dbus.Array):
+		v = [chain_unwrap_dbus_value(x) for x in val]
+		return None if len(v) == 0 else v
+	if isinstance(val, (dbus.Signature, dbus.String)):
+		return str(val)
+	if isinstance(val, (list, tuple)):
+		return [chain_unwrap_dbus_value(x) for x in val]
+	if isinstance(val, (dbus.Dictionary, dict)):
+		return dict([(x, chain_unwrap_dbus_value(y)) for x, y in val.items()])
+	if isinstance(val, dbus.Boolean):
+		return bool(val)
+	return val
+
+class WrapTests(unittest.TestCase):
+	def test_dbus_value_wrapper(self):
+		# a declared valuetype gives the same as finding the type out
+		for valuetype, values in ((float, [0.0, 1.5, -3.25]), (dbus.Int32, [0, 40000, -1]),
+				(bool, [True, False]), (str, ['', 'x']), (int, [1, 2**40])):
+			wrap = dbus_value_wrapper(valuetype)
+			for value in values:
+				self.assertEqual(wrap(value), wrap_dbus_value(value))
+				self.assertIs(type(wrap(value)), type(wrap_dbus_value(value)))
+				self.assertEqual(wrap(value).variant_level, 1)
+		self.assertIs(dbus_value_wrapper(None), wrap_dbus_value)
+		self.assertIs(dbus_value_wrapper(int), wrap_dbus_value)
+
+	def test_unwrap_dbus_value(self):
+		# the type table gives what the isinstance chain gave, type and all
+		values = [dbus.Int32(1, variant_level=1), dbus.UInt32(2), dbus.Int64(2**40), dbus.Byte(84),
+			dbus.Int16(-3), dbus.UInt16(3), dbus.UInt64(4), dbus.Double(1.5, variant_level=1),
+			dbus.String('x', variant_level=1), dbus.Signature('i'), dbus.Boolean(True, variant_level=1),
+			VEDBUS_INVALID, dbus.Array([dbus.Int32(1), dbus.Double(2.5)]),
+			dbus.Dictionary({'a': dbus.Int32(1), 'b': dbus.String('y')}), [dbus.Int32(1)], (dbus.Double(1.0),),
+			1, 1.5, 'x', None]
+		for value in values:
+			self.assertEqual(unwrap_dbus_value(value), chain_unwrap_dbus_value(value))
+			self.assertIs(type(unwrap_dbus_value(value)), type(chain_unwrap_dbus_value(value)))
+
+	def test_item_valuetype(self):
+		dbusConn = dbus.SessionBus(private=True, mainloop=DBusGMainLoop()) \
+			if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True, mainloop=DBusGMainLoop())
+		dbusConn.set_exit_on_disconnect(False)
+		try:
+			item = VeDbusItemExport(dbusConn, '/Float', 1.5, valuetype=float)
+			self.assertIs(type(item.GetValue()), dbus.Double)
+			# None isn't a float, but it is sent as invalid
+			item.local_set_value(None)
+			self.assertIs(item.GetValue(), VEDBUS_INVALID)
+			item.__del__()
+
+			# a value that doesn't fit the declared type is refused like one of the wrong type
+			item = VeDbusItemExport(dbusConn, '/Int', 1, writeable=True, valuetype=dbus.Int32)
+			self.assertEqual(item.SetValue(dbus.Int64(2**40)), 1)
+			self.assertEqual(item.SetValue('x'), 1)
+			self.assertEqual(item.SetValue(dbus.Int32(2)), 0)
+			self.assertEqual(item.GetValue(), 2)
+			item.__del__()
+		finally:
+			dbusConn.close()
+
 """
 MVA 2014-08-30: this test of VEDbusItemImport doesn't work, since there is no gobject-mainloop.
 Probably making some automated functional test, using bash and some scripts, will work much
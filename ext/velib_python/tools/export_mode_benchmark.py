@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares the two ways VeDbusService exports its paths: a dbus object per path (and per node
+# in between) and one fallback object for the whole service. Measures how long it takes to add
+# the paths of a solar charger sized service (about 260 paths) and register it, and how much
+# memory python allocated for it (tracemalloc, so libdbus' own bookkeeping isn't in it):
+#
+#	dbus-run-session python3 export_mode_benchmark.py [paths]
+
+import dbus
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dbus.mainloop.glib import DBusGMainLoop
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from vedbus import VeDbusService
+
+FIELDS = ('Yield', 'MaxPower', 'MaxPvVoltage', 'MinBatteryVoltage', 'MaxBatteryVoltage',
+	'MaxBatteryCurrent', 'MinVoltage')
+
+def paths(count):
+	r = ['/Dc/0/Voltage', '/Dc/0/Current', '/Pv/V', '/Pv/P', '/Yield/Power', '/Yield/User', '/State']
+	r += ['/Settings/Item%d' % i for i in range(43)]
+	day = 0
+	while len(r) < count:
+		r += ['/History/Daily/%d/%s' % (day, field) for field in FIELDS]
+		day += 1
+	return r[:count]
+
+def run(fallback, count, name):
+	bus = dbus.SessionBus(private=True) if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True)
+	gc.collect()
+	tracemalloc.start()
+	start = time.perf_counter()
+	service = VeDbusService(name, bus=bus, register=False, fallback=fallback)
+	for path in paths(count):
+		service.add_path(path, 0, writeable=True)
+	service.register()
+	elapsed = time.perf_counter() - start
+	gc.collect()
+	memory = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	service.__del__()
+	bus.close()
+	return elapsed, memory
+
+def main():
+	DBusGMainLoop(set_as_default=True)
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 260
+	objects = run(False, count, 'com.victronenergy.benchmark.objects')
+	fallback = run(True, count, 'com.victronenergy.benchmark.fallback')
+	print("%d paths" % count)
+	print("  %-22s %12s %12s" % ('', 'startup ms', 'memory kB'))
+	for label, (elapsed, memory) in (('object per path', objects), ('one fallback object', fallback)):
+		print("  %-22s %12.1f %12.1f" % (label, elapsed * 1000, memory / 1024))
+
+if __name__ == "__main__":
+	main()
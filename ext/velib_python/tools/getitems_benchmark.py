@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Times VeDbusRootExport.GetItems on a solar charger sized service (about 260 paths), once
+# rebuilding every entry like it used to and once from the snapshot the service keeps up to
+# date. Measured with nothing changed between the calls, and as a few values changed plus the
+# GetItems after them, like a driver does every second. The second one times the change too,
+# that is where the snapshot is kept up to date. The rebuild runs without that upkeep.
+#
+#	dbus-run-session python3 getitems_benchmark.py [number]
+#
+# Nothing is registered on the bus, GetItems is called straight on the root object.
+
+import dbus
+import os
+import sys
+import timeit
+from dbus.mainloop.glib import DBusGMainLoop
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from vedbus import VeDbusService, VeDbusRootExport
+from ve_utils import wrap_dbus_value
+
+FIELDS = ('Yield', 'MaxPower', 'MaxPvVoltage', 'MinBatteryVoltage', 'MaxBatteryVoltage',
+	'MaxBatteryCurrent', 'MinVoltage')
+
+LIVE = ('/Dc/0/Voltage', '/Dc/0/Current', '/Pv/V', '/Pv/P', '/Yield/Power', '/State',
+	'/Dc/0/Temperature', '/MppTemperature', '/UpdateIndex', '/Yield/User')
+
+def rebuild_get_items(self):
+	# VeDbusRootExport.GetItems before the snapshot
+	return {
+		path: {
+			'Value': wrap_dbus_value(item.local_get_value()),
+			'Text': item.GetText() }
+		for path, item in self._service._dbusobjects.items()
+	}
+
+def text(path, value):
+	return "%.2fV" % value
+
+def build():
+	bus = dbus.SessionBus(private=True) if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True)
+	service = VeDbusService('com.victronenergy.benchmark', bus=bus, register=False)
+	for path in LIVE:
+		service.add_path(path, 1.0, gettextcallback=text)
+	for i in range(40):
+		service.add_path('/Settings/Item%d' % i, i)
+	for day in range(30):
+		for field in FIELDS:
+			service.add_path('/History/Daily/%d/%s' % (day, field), day / 10, gettextcallback=text)
+	return service
+
+def run(number):
+	service = build()
+	root = service._dbusnodes['/']
+	counter = [0]
+
+	def publish():
+		counter[0] += 1
+		with service as s:
+			for path in LIVE:
+				s[path] = counter[0] / 10
+
+	def unchanged():
+		root.GetItems()
+
+	def changed():
+		publish()
+		root.GetItems()
+
+	results = {}
+	get_items = VeDbusRootExport.GetItems
+	try:
+		# before the snapshot the items didn't tell the service about their changes
+		for name, handler, changedcallback in (('rebuild', rebuild_get_items, None),
+				('snapshot', get_items, service._item_changed)):
+			VeDbusRootExport.GetItems = handler
+			for item in service._dbusobjects.values():
+				item._changedcallback = changedcallback
+			results[name, 'unchanged'] = timeit.timeit(unchanged, number=number) / number
+			results[name, 'changed'] = timeit.timeit(changed, number=number) / number
+	finally:
+		VeDbusRootExport.GetItems = get_items
+	paths = len(service._dbusobjects)
+	service.__del__()
+	return paths, results
+
+def main():
+	DBusGMainLoop(set_as_default=True)
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	paths, results = run(number)
+	print("GetItems on %d paths, %d calls" % (paths, number))
+	print("  %-36s %12s %12s" % ('', 'rebuild us', 'snapshot us'))
+	for case, label in (('unchanged', 'GetItems, nothing changed'),
+			('changed', '%d paths changed + GetItems' % len(LIVE))):
+		print("  %-36s %12.1f %12.1f" % (label, results['rebuild', case] * 1e6, results['snapshot', case] * 1e6))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Times deleting the /History/Daily tree of a solar charger sized service (7 paths per day)
+# with ServiceContext.del_tree, once with the node counts and the sorted path index and once
+# with the scans over every node and every path that were used before:
+#
+#	dbus-run-session python3 path_delete_benchmark.py [days] [repeat]
+#
+# Nothing is registered on the bus.
+
+import dbus
+import os
+import sys
+import time
+from dbus.mainloop.glib import DBusGMainLoop
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from vedbus import VeDbusService, ServiceContext
+
+FIELDS = ('Yield', 'MaxPower', 'MaxPvVoltage', 'MinBatteryVoltage', 'MaxBatteryVoltage',
+	'MaxBatteryCurrent', 'MinVoltage')
+
+OTHER = ('/Dc/0/Voltage', '/Dc/0/Current', '/Dc/0/Temperature', '/Pv/V', '/Pv/P', '/Yield/Power',
+	'/Yield/User', '/Yield/System', '/State', '/ErrorCode', '/Mode', '/Load/State', '/Load/I',
+	'/History/Overall/MaxPvVoltage', '/History/Overall/MaxBatteryVoltage',
+	'/History/Overall/MinBatteryVoltage', '/History/Overall/DaysAvailable')
+
+def scan_item_deleted(self, path):
+	# VeDbusService._item_deleted before the node counts
+	self._dbusobjects.pop(path)
+	for np in list(self._dbusnodes.keys()):
+		if np != '/':
+			for ip in self._dbusobjects:
+				if ip.startswith(np + '/'):
+					break
+			else:
+				self._dbusnodes[np].__del__()
+				self._dbusnodes.pop(np)
+
+def scan_del_tree(self, root):
+	# ServiceContext.del_tree before the path index
+	root = root.rstrip('/')
+	for p in list(self.parent._dbusobjects.keys()):
+		if p == root or p.startswith(root + '/'):
+			self[p] = None
+			self.parent._dbusobjects[p].__del__()
+
+def build(days):
+	bus = dbus.SessionBus(private=True) if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True)
+	service = VeDbusService('com.victronenergy.benchmark', bus=bus, register=False)
+	for path in OTHER:
+		service.add_path(path, 1)
+	for day in range(days):
+		for field in FIELDS:
+			service.add_path('/History/Daily/%d/%s' % (day, field), day)
+	return service
+
+def run(days, repeat):
+	t = 0
+	for i in range(repeat):
+		service = build(days)
+		start = time.perf_counter()
+		with service as s:
+			s.del_tree('/History/Daily')
+		t += time.perf_counter() - start
+		assert not any(p.startswith('/History/Daily') for p in service._dbusnodes)
+		service.__del__()
+	return t / repeat
+
+def main():
+	DBusGMainLoop(set_as_default=True)
+	days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+	repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+	counted = run(days, repeat)
+
+	item_deleted, del_tree = VeDbusService._item_deleted, ServiceContext.del_tree
+	VeDbusService._item_deleted, ServiceContext.del_tree = scan_item_deleted, scan_del_tree
+	try:
+		scanned = run(days, repeat)
+	finally:
+		VeDbusService._item_deleted, ServiceContext.del_tree = item_deleted, del_tree
+
+	print("del_tree('/History/Daily'), %d days, %d paths deleted out of %d" % (
+		days, days * len(FIELDS), days * len(FIELDS) + len(OTHER)))
+	print("  scans        %10.2f ms" % (scanned * 1000))
+	print("  node counts  %10.2f ms" % (counted * 1000))
+	print("  speedup      %10.1fx" % (scanned / counted))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Times GetValue and GetText on the intermediate nodes of a VeDbusService (for example
+# /History/Daily/7), once with the sorted path index and once with the linear scan over all
+# objects that was used before. Run it with 1k and 10k paths:
+#
+#	dbus-run-session python3 path_index_benchmark.py 1000 10000
+#
+# Nothing is registered on the bus, the methods are called straight on the objects.
+
+import dbus
+import os
+import sys
+import timeit
+from dbus.mainloop.glib import DBusGMainLoop
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from vedbus import VeDbusService, VeDbusTreeExport
+from ve_utils import wrap_dbus_value
+
+FIELDS = ('Yield', 'MaxPower', 'MaxPvVoltage', 'MinBatteryVoltage', 'MaxBatteryVoltage',
+	'MaxBatteryCurrent', 'TimeInBulk', 'TimeInAbsorption', 'TimeInFloat', 'LastError1')
+
+def linear_get_value_handler(self, path, get_text=False):
+	# VeDbusTreeExport._get_value_handler before the index
+	r = {}
+	px = path
+	if not px.endswith('/'):
+		px += '/'
+	for p, item in self._service._dbusobjects.items():
+		if p.startswith(px):
+			v = item.GetText() if get_text else wrap_dbus_value(item.local_get_value())
+			r[p[len(px):]] = v
+	return r
+
+def build(count):
+	bus = dbus.SessionBus(private=True) if 'DBUS_SESSION_BUS_ADDRESS' in os.environ else dbus.SystemBus(private=True)
+	service = VeDbusService('com.victronenergy.benchmark', bus=bus, register=False)
+	service.add_path('/Dc/0/Voltage', 13.2)
+	service.add_path('/Dc/0/Current', 4.5)
+	days = count // len(FIELDS)
+	for day in range(days):
+		for field in FIELDS:
+			service.add_path('/History/Daily/%d/%s' % (day, field), day)
+	return service, days
+
+def run(count, number=200):
+	service, days = build(count)
+	paths = len(service._paths)
+	queries = ['/History/Daily/%d' % (days // 2), '/Dc/0', '/Dc']
+	results = {}
+	index = VeDbusTreeExport._get_value_handler
+	try:
+		for name, handler in (('linear', linear_get_value_handler), ('index', index)):
+			VeDbusTreeExport._get_value_handler = handler
+			for path in queries:
+				node = service._dbusnodes[path]
+				t = timeit.timeit(node.GetValue, number=number) + timeit.timeit(node.GetText, number=number)
+				results[name, path] = t / (2 * number)
+	finally:
+		VeDbusTreeExport._get_value_handler = index
+		service.__del__()
+	return paths, queries, results
+
+def main():
+	DBusGMainLoop(set_as_default=True)
+	for count in [int(a) for a in sys.argv[1:]] or [1000, 10000]:
+		count, queries, results = run(count)
+		print("%d paths" % count)
+		print("  %-20s %12s %12s %8s" % ('node', 'linear us', 'index us', 'speedup'))
+		for path in queries:
+			linear = results['linear', path] * 1e6
+			indexed = results['index', path] * 1e6
+			print("  %-20s %12.1f %12.1f %7.1fx" % (path, linear, indexed, linear / indexed))
+
+if __name__ == "__main__":
+	main()
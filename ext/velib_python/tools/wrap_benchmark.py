@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Times wrapping and unwrapping the values of a solar charger sized GetItems payload (about 260
+# paths): the isinstance chain of wrap_dbus_value against the per path wrappers of paths that
+# declare their valuetype, and the isinstance chain unwrap_dbus_value used to be against the type
+# table it looks in now.
+# Doesn't need a bus, only the dbus module:
+#
+#	python3 wrap_benchmark.py [number]
+
+import dbus
+import os
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '../'))
+from ve_utils import wrap_dbus_value, unwrap_dbus_value, dbus_value_wrapper, dbus_int_types, VEDBUS_INVALID
+
+def chain_unwrap_dbus_value(val):
+	# unwrap_dbus_value before the type table, the rarely seen types left out
+	if isinstance(val, dbus_int_types):
+		return int(val)
+	if isinstance(val, dbus.Double):
+		return float(val)
+	if isinstance(val, dbus.Array):
+		v = [chain_unwrap_dbus_value(x) for x in val]
+		return None if len(v) == 0 else v
+	if isinstance(val, (dbus.Signature, dbus.String)):
+		return str(val)
+	if isinstance(val, dbus.Boolean):
+		return bool(val)
+	return val
+
+def payload():
+	values = {}
+	types = {}
+	for path, value, valuetype in (('/Dc/0/Voltage', 13.2, float), ('/Dc/0/Current', 4.51, float),
+			('/Pv/V', 41.7, float), ('/Pv/P', 80, dbus.Int32), ('/Yield/Power', 80, dbus.Int32), ('/Yield/User', 205, dbus.Int32),
+			('/Yield/System', 8550, int), ('/State', 3, dbus.Int32), ('/ErrorCode', 0, dbus.Int32), ('/Load/I', None, float),
+			('/ProductName', 'MS-4840N', None), ('/Mgmt/Connection', 'USB', None), ('/Connected', 1, None)):
+		values[path] = value
+		types[path] = valuetype
+	for i in range(37):
+		values['/Settings/Item%d' % i] = i
+		types['/Settings/Item%d' % i] = None
+	for day in range(30):
+		for field, value, valuetype in (('Yield', 0.205, float), ('MaxPower', 248, dbus.Int32),
+				('MaxPvVoltage', 44.1, float), ('MinBatteryVoltage', 13.1, float),
+				('MaxBatteryVoltage', 14.7, float), ('MaxBatteryCurrent', 12.5, float), ('MinVoltage', None, None)):
+			path = '/History/Daily/%d/%s' % (day, field)
+			values[path] = value
+			types[path] = valuetype
+	return values, types
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	values, types = payload()
+	wrappers = {path: dbus_value_wrapper(t) for path, t in types.items() if t is not None}
+	wrapped = {k: wrap_dbus_value(v) for k, v in values.items()}
+	# what VeDbusItemExport does with the wrapper of its valuetype
+	declared = lambda: {k: VEDBUS_INVALID if v is None else wrappers.get(k, wrap_dbus_value)(v) for k, v in values.items()}
+	assert declared() == wrapped
+	assert {k: unwrap_dbus_value(v) for k, v in wrapped.items()} == {k: chain_unwrap_dbus_value(v) for k, v in wrapped.items()}
+
+	def t(f):
+		return timeit.timeit(f, number=number) / number * 1e6
+
+	print("%d values, us per payload" % len(values))
+	print("  wrap   isinstance chain        %8.1f" % t(lambda: {k: wrap_dbus_value(v) for k, v in values.items()}))
+	print("  wrap   declared valuetypes     %8.1f" % t(declared))
+	print("  unwrap isinstance chain        %8.1f" % t(lambda: {k: chain_unwrap_dbus_value(v) for k, v in wrapped.items()}))
+	print("  unwrap type table              %8.1f" % t(lambda: {k: unwrap_dbus_value(v) for k, v in wrapped.items()}))
+
+if __name__ == "__main__":
+	main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import sys
+from functools import partial
 from traceback import print_exc
 from os import _exit as os_exit
 from os import statvfs
@@ -231,20 +232,59 @@ def wrap_dbus_value(value):
 		return dbus.Dictionary({(k, wrap_dbus_value(v)) for k, v in value.items()}, variant_level=1)
 	return value
 
+# The dbus type a value of a valuetype that is known up front goes into, see dbus_value_wrapper.
+# int isn't in here, it needs the Int64 fallback of wrap_dbus_value for values that don't fit
+# 32 bits. Declare dbus.Int32 for values that always fit.
+_typed_wrappers = {
+	float: dbus.Double,
+	bool: dbus.Boolean,
+	str: dbus.String,
+	dbus.Double: dbus.Double,
+	dbus.Int32: dbus.Int32,
+	dbus.Int64: dbus.Int64,
+	dbus.UInt32: dbus.UInt32,
+	dbus.Boolean: dbus.Boolean,
+	dbus.String: dbus.String,
+}
+
+def dbus_value_wrapper(valuetype):
+	"""Returns what wraps the values of valuetype (float, dbus.Int32, ...) for the dbus: the
+	constructor of the dbus type itself, so the value is converted to it and not looked at first.
+	It doesn't take None, the caller sends VEDBUS_INVALID for that. Without a valuetype, or one
+	there is no dbus type for, that is wrap_dbus_value itself."""
+	dbustype = _typed_wrappers.get(valuetype)
+	if dbustype is None:
+		return wrap_dbus_value
+	return partial(dbustype, variant_level=1)
 
 dbus_int_types = (dbus.Int32, dbus.UInt32, dbus.Byte, dbus.Int16, dbus.UInt16, dbus.UInt32, dbus.Int64, dbus.UInt64)
 
+def _unwrap_array(val):
+	v = [unwrap_dbus_value(x) for x in val]
+	return None if len(v) == 0 else v
+
+_unwrappers = {
+	dbus.Int32: int, dbus.UInt32: int, dbus.Byte: int, dbus.Int16: int, dbus.UInt16: int,
+	dbus.Int64: int, dbus.UInt64: int,
+	dbus.Double: float,
+	dbus.String: str, dbus.Signature: str,
+	dbus.Boolean: bool,
+	dbus.Array: _unwrap_array,
+	int: int, float: float, str: str, bool: bool, type(None): lambda val: val,
+}
 
 def unwrap_dbus_value(val):
 	"""Converts D-Bus values back to the original type. For example if val is of type DBus.Double,
 	a float will be returned."""
+	unwrap = _unwrappers.get(type(val))
+	if unwrap is not None:
+		return unwrap(val)
 	if isinstance(val, dbus_int_types):
 		return int(val)
 	if isinstance(val, dbus.Double):
 		return float(val)
 	if isinstance(val, dbus.Array):
-		v = [unwrap_dbus_value(x) for x in val]
-		return None if len(v) == 0 else v
+		return _unwrap_array(val)
 	if isinstance(val, (dbus.Signature, dbus.String)):
 		return str(val)
 	# Python has no byte type, so we convert to an integer.
@@ -2,12 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import dbus.service
+from dbus.lowlevel import SignalMessage
 import logging
 import traceback
 import os
 import weakref
+from bisect import bisect_left, insort
 from collections import defaultdict
-from ve_utils import wrap_dbus_value, unwrap_dbus_value
+from time import monotonic
+from gi.repository import GLib
+from ve_utils import wrap_dbus_value, unwrap_dbus_value, dbus_value_wrapper, VEDBUS_INVALID
 
 # vedbus contains three classes:
 # VeDbusItemImport -> use this to read data from the dbus, ie import
@@ -57,12 +61,36 @@ from ve_utils import wrap_dbus_value, unwrap_dbus_value
 #   The signature of a variant is 'v'.
 
 # Export ourselves as a D-Bus service.
+#
+# With fallback=True the paths are not exported as a dbus object each, one fallback object on /
+# answers for every path (see VeDbusFallbackExport). Same com.victronenergy.BusItem interface,
+# much less to register and keep around for services with many paths.
 class VeDbusService(object):
-	def __init__(self, servicename, bus=None, register=True):
+	def __init__(self, servicename, bus=None, register=True, fallback=False):
 		# dict containing the VeDbusItemExport objects, with their path as the key.
 		self._dbusobjects = {}
+		self._fallback = fallback
+		# sorted list of the paths in _dbusobjects, everything below a node sits in one
+		# contiguous run of it, see _subtree
+		self._paths = []
 		self._dbusnodes = {}
+		# number of objects below every intermediate path, a node goes away when it drops to 0
+		self._nodecounts = {}
+		# what GetItems returns, {path: {'Value': ..., 'Text': ...}}. Patched with the changes of
+		# every item as they happen, paths missing from it are filled in on the next GetItems.
+		# _generation goes up with every change, a copy handed out at the same generation is
+		# handed out again.
+		self._items = {}
+		self._generation = 0
+		self._itemscopy = None
+		self._itemscopygeneration = None
 		self._ratelimiters = []
+		# SignalRateLimit per path prefix, see set_signal_rate. _signallimitof caches the limit
+		# (or None) every path falls under.
+		self._signallimits = {}
+		self._signallimitof = {}
+		# (valuecallback, gettextcallback) per path prefix, see add_tree_handler
+		self._treehandlers = {}
 		self._dbusname = None
 		self.name = servicename
 
@@ -76,7 +104,10 @@ class VeDbusService(object):
 		self.dbusconn = self._dbusconn
 
 		# Add the root item that will return all items as a tree
-		self._dbusnodes['/'] = VeDbusRootExport(self._dbusconn, '/', self)
+		if fallback:
+			self._dbusnodes['/'] = VeDbusFallbackExport(self._dbusconn, '/', self)
+		else:
+			self._dbusnodes['/'] = VeDbusRootExport(self._dbusconn, '/', self)
 
 		# Immediately register the service unless requested not to
 		if register:
@@ -94,12 +125,22 @@ class VeDbusService(object):
 	# To force immediate deregistering of this dbus service and all its object paths, explicitly
 	# call __del__().
 	def __del__(self):
+		# what the limits held back still goes out, the values were set before the service went
+		for limit in self._signallimits.values():
+			limit.flush()
+		self._signallimits.clear()
+		self._signallimitof.clear()
+		self._treehandlers.clear()
 		for node in list(self._dbusnodes.values()):
 			node.__del__()
 		self._dbusnodes.clear()
+		self._nodecounts.clear()
+		self._items.clear()
+		self._itemscopy = None
 		for item in list(self._dbusobjects.values()):
 			item.__del__()
 		self._dbusobjects.clear()
+		del self._paths[:]
 		if self._dbusname:
 			self._dbusname.__del__()  # Forces call to self._bus.release_name(self._name), see source code
 		self._dbusname = None
@@ -116,19 +157,98 @@ class VeDbusService(object):
 		if onchangecallback is not None:
 			self._onchangecallbacks[path] = onchangecallback
 
-		itemtype = itemtype or VeDbusItemExport
-		item = itemtype(self._dbusconn, path, value, description, writeable,
-				self._value_changed, gettextcallback, deletecallback=self._item_deleted, valuetype=valuetype)
+		if itemtype is None and self._fallback:
+			# not exported on its own, the fallback object answers for it. Same as dbus does when
+			# registering an object path twice, refuse to export a path twice.
+			if path in self._dbusobjects:
+				raise KeyError("%s is already exported" % path)
+			item = VeDbusFallbackItem(self._dbusnodes['/'], path, value, description, writeable,
+				self._value_changed, gettextcallback, deletecallback=self._item_deleted, valuetype=valuetype,
+				changedcallback=self._item_changed)
+		else:
+			itemtype = itemtype or VeDbusItemExport
+			item = itemtype(self._dbusconn, path, value, description, writeable,
+				self._value_changed, gettextcallback, deletecallback=self._item_deleted, valuetype=valuetype,
+				changedcallback=self._item_changed)
 
+		new = path not in self._dbusobjects
 		spl = path.split('/')
 		for i in range(2, len(spl)):
 			subPath = '/'.join(spl[:i])
-			if subPath not in self._dbusnodes and subPath not in self._dbusobjects:
+			if not self._fallback and subPath not in self._dbusnodes and subPath not in self._dbusobjects:
 				self._dbusnodes[subPath] = VeDbusTreeExport(self._dbusconn, subPath, self)
+			if new:
+				self._nodecounts[subPath] = self._nodecounts.get(subPath, 0) + 1
+		if new:
+			insort(self._paths, path)
+		self._items.pop(path, None)
+		self._generation += 1
 		self._dbusobjects[path] = item
 		logging.debug('added %s with start value %s. Writeable is %s' % (path, value, writeable))
 		return item
 
+	# Limit the signals for a path, or every path below a prefix, to one per interval seconds.
+	# The first change goes out right away, changes coming in faster than that are held back
+	# and the latest value of every held path goes out in one ItemsChanged when the interval is
+	# over. The values themselves (GetValue, GetItems) are always up to date, only the signals
+	# are held back. Invalidating a path (None) is never held back. The longest prefix that
+	# matches a path counts, an interval of None removes the limit.
+	# The limit is per prefix, not per path: all the paths below it share one interval, so a
+	# change to one of them holds back the changes to the others until the interval is over.
+	def set_signal_rate(self, prefix, interval):
+		prefix = prefix.rstrip('/') or '/'
+		old = self._signallimits.pop(prefix, None)
+		if old is not None:
+			old.flush()
+		if interval is not None:
+			self._signallimits[prefix] = SignalRateLimit(self, interval)
+		self._signallimitof.clear()
+
+	# Answer GetValue and GetText for the paths below prefix that aren't added to the service, for
+	# many paths that are hardly ever read (years of history for example) and aren't worth an
+	# object each. valuecallback(path) returns the value of path, or None when there is nothing
+	# there (the path doesn't exist). gettextcallback(path, value) works as it does for add_path.
+	# The paths don't show up in GetItems and never send a signal, the paths added below prefix
+	# keep answering for themselves.
+	def add_tree_handler(self, prefix, valuecallback, gettextcallback=None):
+		self._treehandlers[prefix] = (valuecallback, gettextcallback)
+		if self._fallback:
+			return
+		# the node on prefix has to be a fallback object to get the calls for the paths below it
+		old = self._dbusnodes.pop(prefix, None)
+		if old is not None:
+			old.__del__()
+		self._dbusnodes[prefix] = VeDbusTreeHandlerExport(self._dbusconn, prefix, self)
+
+	# The (value, text) of a path below a tree handler, None if there is no such path.
+	def _handled_item(self, path):
+		p = path
+		while p != '/':
+			p = p[:p.rfind('/')] or '/'
+			handler = self._treehandlers.get(p)
+			if handler is None:
+				continue
+			valuecallback, gettextcallback = handler
+			value = valuecallback(path)
+			if value is None:
+				return None
+			return value, gettextcallback(path, value) if gettextcallback else str(value)
+		return None
+
+	def _signal_limit(self, path):
+		try:
+			return self._signallimitof[path]
+		except KeyError:
+			pass
+		p = path
+		while True:
+			limit = self._signallimits.get(p)
+			if limit is not None or p == '/':
+				break
+			p = p[:p.rfind('/')] or '/'
+		self._signallimitof[path] = limit
+		return limit
+
 	# Add the mandatory paths, as per victron dbus api doc
 	def add_mandatory_paths(self, processname, processversion, connection,
 			deviceinstance, productid, productname, firmwareversion, hardwareversion, connected):
@@ -152,16 +272,72 @@ class VeDbusService(object):
 
 		return self._onchangecallbacks[path](path, newvalue)
 
+	# Called by the VeDbusItemExport objects with the changes they signal, whichever way their
+	# value was changed. Those are exactly the entries GetItems returns.
+	# Returns True when the signal for this change is held back by a rate limit.
+	def _item_changed(self, path, changes):
+		self._items[path] = changes
+		self._generation += 1
+		if not self._signallimits:
+			return False
+		limit = self._signal_limit(path)
+		return limit is not None and limit.hold(path, changes)
+
+	def _get_items(self):
+		if self._itemscopygeneration == self._generation:
+			return self._itemscopy
+		items = self._items
+		if len(items) != len(self._dbusobjects):
+			for path, item in self._dbusobjects.items():
+				if path not in items:
+					items[path] = {
+						'Value': item.GetValue(),
+						'Text': item.GetText() }
+		self._itemscopy = dict(items)
+		self._itemscopygeneration = self._generation
+		return self._itemscopy
+
 	def _item_deleted(self, path):
 		self._dbusobjects.pop(path)
-		for np in list(self._dbusnodes.keys()):
-			if np != '/':
-				for ip in self._dbusobjects:
-					if ip.startswith(np + '/'):
-						break
-				else:
-					self._dbusnodes[np].__del__()
-					self._dbusnodes.pop(np)
+		self._items.pop(path, None)
+		self._generation += 1
+		i = bisect_left(self._paths, path)
+		if i < len(self._paths) and self._paths[i] == path:
+			del self._paths[i]
+
+		# only the nodes above this path can have become empty
+		spl = path.split('/')
+		for i in range(2, len(spl)):
+			np = '/'.join(spl[:i])
+			count = self._nodecounts.get(np, 0) - 1
+			if count > 0:
+				self._nodecounts[np] = count
+				continue
+			self._nodecounts.pop(np, None)
+			if np in self._treehandlers:
+				continue
+			node = self._dbusnodes.pop(np, None)
+			if node is not None:
+				node.__del__()
+
+	# Yields (path, item) for every object below the node at root, without looking at the
+	# objects outside of it. The paths are kept sorted, so the ones starting with root + '/'
+	# are all next to each other.
+	def _subtree(self, root):
+		px = root if root.endswith('/') else root + '/'
+		paths = self._paths
+		i = bisect_left(paths, px)
+		while i < len(paths) and paths[i].startswith(px):
+			yield paths[i], self._dbusobjects[paths[i]]
+			i += 1
+
+	# The names of the objects and nodes right below path, for introspection.
+	def _children(self, path):
+		px = path if path.endswith('/') else path + '/'
+		children = {}
+		for p, item in self._subtree(px):
+			children[p[len(px):].split('/', 1)[0]] = None
+		return list(children)
 
 	def __getitem__(self, path):
 		return self._dbusobjects[path].local_get_value()
@@ -216,20 +392,63 @@ class ServiceContext(object):
 	def add_path(self, path, value, *args, **kwargs):
 		self.parent.add_path(path, value, *args, **kwargs)
 		self.changes[path] = {
-			'Value': wrap_dbus_value(value),
+			'Value': self.parent._dbusobjects[path].GetValue(),
 			'Text': self.parent._dbusobjects[path].GetText()
 		}
 
 	def del_tree(self, root):
 		root = root.rstrip('/')
-		for p in list(self.parent._dbusobjects.keys()):
-			if p == root or p.startswith(root + '/'):
-				self[p] = None
-				self.parent._dbusobjects[p].__del__()
+		paths = [p for p, item in self.parent._subtree(root)]
+		if root in self.parent._dbusobjects:
+			paths.append(root)
+		for p in paths:
+			self[p] = None
+			self.parent._dbusobjects[p].__del__()
 
 	def get_name(self):
 		return self.parent.get_name()
 
+class SignalRateLimit(object):
+	""" The signals of a group of paths, at most one per interval. What comes in between
+	    is held back and sent in one ItemsChanged at the end of the interval (trailing edge),
+	    with the latest value of every path. """
+	def __init__(self, service, interval):
+		self.service = service
+		self.interval = interval
+		self.last = None
+		self.pending = {}
+		self.timer = None
+
+	def hold(self, path, changes):
+		if changes['Value'] is VEDBUS_INVALID:
+			# never hold back an invalidation, and don't send an older value after it
+			self.pending.pop(path, None)
+			return False
+		now = monotonic()
+		if self.timer is None and (self.last is None or now - self.last >= self.interval):
+			self.last = now
+			return False
+		self.pending[path] = changes
+		if self.timer is None:
+			self.timer = GLib.timeout_add(max(0, int((self.last + self.interval - now) * 1000)), self._timeout)
+		return True
+
+	def _timeout(self):
+		self.timer = None
+		self.flush()
+		return False
+
+	def flush(self):
+		if self.timer is not None:
+			GLib.source_remove(self.timer)
+			self.timer = None
+		if self.pending:
+			self.last = monotonic()
+			root = self.service._dbusnodes.get('/')
+			if root is not None:
+				root.ItemsChanged(self.pending)
+			self.pending = {}
+
 class TrackerDict(defaultdict):
 	""" Same as defaultdict, but passes the key to default_factory. """
 	def __missing__(self, key):
@@ -454,10 +673,9 @@ class VeDbusTreeExport(dbus.service.Object):
 		px = path
 		if not px.endswith('/'):
 			px += '/'
-		for p, item in self._service._dbusobjects.items():
-			if p.startswith(px):
-				v = item.GetText() if get_text else wrap_dbus_value(item.local_get_value())
-				r[p[len(px):]] = v
+		for p, item in self._service._subtree(px):
+			v = item.GetText() if get_text else item.GetValue()
+			r[p[len(px):]] = v
 		logging.debug(r)
 		return r
 
@@ -480,12 +698,155 @@ class VeDbusRootExport(VeDbusTreeExport):
 
 	@dbus.service.method('com.victronenergy.BusItem', out_signature='a{sa{sv}}')
 	def GetItems(self):
-		return {
-			path: {
-				'Value': wrap_dbus_value(item.local_get_value()),
-				'Text': item.GetText() }
-			for path, item in self._service._dbusobjects.items()
-		}
+		return self._service._get_items()
+
+
+## The node on the prefix of a tree handler (see VeDbusService.add_tree_handler). Registered as a
+# fallback, so besides the node itself it gets the calls for every path below it that isn't an
+# object of its own.
+class VeDbusTreeHandlerExport(dbus.service.FallbackObject):
+	def __init__(self, bus, objectPath, service):
+		dbus.service.FallbackObject.__init__(self, bus, objectPath)
+		self._service = service
+		self.path = objectPath
+		logging.debug("VeDbusTreeHandlerExport %s has been created" % objectPath)
+
+	def __del__(self):
+		if len(self._locations) == 0:
+			return
+		self.remove_from_connection()
+		logging.debug("VeDbusTreeHandlerExport %s has been removed" % self.path)
+
+	def _item(self, path):
+		item = self._service._handled_item(path)
+		if item is None:
+			raise dbus.exceptions.DBusException("No object at %s" % path,
+				name='org.freedesktop.DBus.Error.UnknownObject')
+		return item
+
+	@dbus.service.method('com.victronenergy.BusItem', out_signature='v', path_keyword='path')
+	def GetValue(self, path):
+		if path == self.path:
+			value = VeDbusTreeExport._get_value_handler(self, path)
+			return dbus.Dictionary(value, signature=dbus.Signature('sv'), variant_level=1)
+		return wrap_dbus_value(self._item(path)[0])
+
+	# No out_signature, the node returns a dict and a path below it a string, see
+	# VeDbusFallbackExport.GetText
+	@dbus.service.method('com.victronenergy.BusItem', path_keyword='path')
+	def GetText(self, path):
+		if path == self.path:
+			text = VeDbusTreeExport._get_value_handler(self, path, True)
+			return dbus.Dictionary(text, signature=dbus.Signature('ss'), variant_level=1)
+		return dbus.String(self._item(path)[1])
+
+	def local_get_value(self):
+		return VeDbusTreeExport._get_value_handler(self, self.path)
+
+
+## One object registered as a fallback on /, answering for every path of the service.
+# The methods get the object path they were called on and look the path up in the service:
+# an item answers like VeDbusItemExport, a node in between like VeDbusTreeExport and / like
+# VeDbusRootExport. The signals of an item are sent from the path of that item.
+class VeDbusFallbackExport(dbus.service.FallbackObject):
+	def __init__(self, bus, objectPath, service):
+		dbus.service.FallbackObject.__init__(self, bus, objectPath)
+		self._service = service
+		logging.debug("VeDbusFallbackExport %s has been created" % objectPath)
+
+	def __del__(self):
+		if len(self._locations) == 0:
+			return
+		path = self._locations[0][1]
+		self.remove_from_connection()
+		logging.debug("VeDbusFallbackExport %s has been removed" % path)
+
+	def _item(self, path):
+		return self._service._dbusobjects.get(path)
+
+	def _node(self, path):
+		if path != '/' and path not in self._service._nodecounts:
+			raise dbus.exceptions.DBusException("No object at %s" % path,
+				name='org.freedesktop.DBus.Error.UnknownObject')
+		return path
+
+	def _no_method(self, path, method):
+		return dbus.exceptions.DBusException("%s is not supported on %s" % (method, path),
+			name='org.freedesktop.DBus.Error.UnknownMethod')
+
+	@dbus.service.method('com.victronenergy.BusItem', out_signature='v', rel_path_keyword='path')
+	def GetValue(self, path):
+		item = self._item(path)
+		if item is not None:
+			return item.GetValue()
+		handled = self._service._handled_item(path)
+		if handled is not None:
+			return wrap_dbus_value(handled[0])
+		value = VeDbusTreeExport._get_value_handler(self, self._node(path))
+		return dbus.Dictionary(value, signature=dbus.Signature('sv'), variant_level=1)
+
+	# No out_signature, an item returns a string ('s') and a node a dict (in a variant), like
+	# VeDbusItemExport.GetText and VeDbusTreeExport.GetText do.
+	@dbus.service.method('com.victronenergy.BusItem', rel_path_keyword='path')
+	def GetText(self, path):
+		item = self._item(path)
+		if item is not None:
+			return dbus.String(item.GetText())
+		handled = self._service._handled_item(path)
+		if handled is not None:
+			return dbus.String(handled[1])
+		text = VeDbusTreeExport._get_value_handler(self, self._node(path), True)
+		return dbus.Dictionary(text, signature=dbus.Signature('ss'), variant_level=1)
+
+	@dbus.service.method('com.victronenergy.BusItem', in_signature='v', out_signature='i', rel_path_keyword='path')
+	def SetValue(self, newvalue, path):
+		item = self._item(path)
+		if item is None:
+			raise self._no_method(self._node(path), 'SetValue')
+		return item.SetValue(newvalue)
+
+	@dbus.service.method('com.victronenergy.BusItem', in_signature='si', out_signature='s', rel_path_keyword='path')
+	def GetDescription(self, language, length, path):
+		item = self._item(path)
+		if item is None:
+			raise self._no_method(self._node(path), 'GetDescription')
+		return item.GetDescription(language, length)
+
+	@dbus.service.method('com.victronenergy.BusItem', out_signature='a{sa{sv}}', rel_path_keyword='path')
+	def GetItems(self, path):
+		if path != '/':
+			raise self._no_method(path, 'GetItems')
+		return self._service._get_items()
+
+	# The paths aren't registered on the connection, so add them to the introspection data
+	@dbus.service.method(dbus.INTROSPECTABLE_IFACE, in_signature='', out_signature='s',
+			path_keyword='object_path', connection_keyword='connection')
+	def Introspect(self, object_path, connection):
+		xml = dbus.service.FallbackObject.Introspect(self, object_path, connection)
+		children = ''.join('  <node name="%s"/>\n' % name for name in self._service._children(object_path))
+		i = xml.rfind('</node>')
+		return xml[:i] + children + xml[i:]
+
+	# Only here for the introspection data of the items, they send their signal with
+	# send_properties_changed. A signal with a rel_path_keyword is sent from our own path plus
+	# the relative one, which is '//A/B' for us on '/'.
+	@dbus.service.signal('com.victronenergy.BusItem', signature='a{sv}')
+	def PropertiesChanged(self, changes):
+		pass
+
+	## Sends the PropertiesChanged signal of the item on path, from path itself
+	def send_properties_changed(self, path, changes):
+		for location in self.locations:
+			message = SignalMessage(path, 'com.victronenergy.BusItem', 'PropertiesChanged')
+			message.append(changes, signature='a{sv}')
+			location[0].send_message(message)
+
+	@dbus.service.signal('com.victronenergy.BusItem', signature='a{sa{sv}}')
+	def ItemsChanged(self, changes):
+		pass
+
+	def local_get_value(self):
+		return VeDbusTreeExport._get_value_handler(self, '/')
 
 
 class VeDbusItemExport(dbus.service.Object):
@@ -501,9 +862,12 @@ class VeDbusItemExport(dbus.service.Object):
 	# @param callback	  Function that will be called when someone else changes the value of this VeBusItem
 	#                     over the dbus. First parameter passed to callback will be our path, second the new
 	#					  value. This callback should return True to accept the change, False to reject it.
+	# @param changedcallback  Function that will be called after the value changed, whoever changed it. First
+	#					  parameter is our path, second the changes that are signalled (Value and Text).
+	#					  When it returns True no signal is sent for this change, the callback takes care of it.
 	def __init__(self, bus, objectPath, value=None, description=None, writeable=False,
 					onchangecallback=None, gettextcallback=None, deletecallback=None,
-					valuetype=None):
+					valuetype=None, changedcallback=None):
 		dbus.service.Object.__init__(self, bus, objectPath)
 		self._onchangecallback = onchangecallback
 		self._gettextcallback = gettextcallback
@@ -511,7 +875,12 @@ class VeDbusItemExport(dbus.service.Object):
 		self._description = description
 		self._writeable = writeable
 		self._deletecallback = deletecallback
+		self._changedcallback = changedcallback
 		self._type = valuetype
+		# wraps our valid values for the dbus, straight into the right dbus type when valuetype is known
+		self._wrap = dbus_value_wrapper(valuetype)
+		# text of the current value, rendered on the first GetText after a change
+		self._text = None
 
 	# To force immediate deregistering of this dbus object, explicitly call __del__().
 	def __del__(self):
@@ -544,10 +913,14 @@ class VeDbusItemExport(dbus.service.Object):
 			return None
 
 		self._value = newvalue
-		return {
-			'Value': wrap_dbus_value(newvalue),
+		self._text = None
+		changes = {
+			'Value': VEDBUS_INVALID if newvalue is None else self._wrap(newvalue),
 			'Text': self.GetText()
 		}
+		if self._changedcallback is not None and self._changedcallback(self.__dbus_object_path__, changes):
+			return None  # the signal is held back, see VeDbusService.set_signal_rate
+		return changes
 
 	def local_get_value(self):
 		return self._value
@@ -573,7 +946,7 @@ class VeDbusItemExport(dbus.service.Object):
 		if self._type is not None and newvalue is not None:
 			try:
 				newvalue = self._type(newvalue)
-			except (ValueError, TypeError):
+			except (ValueError, TypeError, OverflowError):
 				return 1 # NOT OK
 
 		if newvalue == self._value:
@@ -603,13 +976,21 @@ class VeDbusItemExport(dbus.service.Object):
 	# @return the value when valid, and otherwise an empty array
 	@dbus.service.method('com.victronenergy.BusItem', out_signature='v')
 	def GetValue(self):
-		return wrap_dbus_value(self._value)
+		return VEDBUS_INVALID if self._value is None else self._wrap(self._value)
 
 	## Dbus exported method GetText
 	# Returns the value as string of the dbus-object-path.
+	# The text is rendered once per value, the signal on a change, GetItems and GetText all
+	# reuse it until the value changes again. So the gettextcallback has to depend on the
+	# value only.
 	# @return text A text-value. '---' when local value is invalid
 	@dbus.service.method('com.victronenergy.BusItem', out_signature='s')
 	def GetText(self):
+		if self._text is None:
+			self._text = self._render_text()
+		return self._text
+
+	def _render_text(self):
 		if self._value is None:
 			return '---'
 
@@ -634,6 +1015,31 @@ class VeDbusItemExport(dbus.service.Object):
 	def PropertiesChanged(self, changes):
 		pass
 
+## A VeDbusItemExport that isn't exported on its own. VeDbusFallbackExport answers the calls
+# on its path and sends its signals.
+class VeDbusFallbackItem(VeDbusItemExport):
+	def __init__(self, export, objectPath, *args, **kwargs):
+		self._path = objectPath
+		self._export = export
+		VeDbusItemExport.__init__(self, None, None, *args, **kwargs)
+
+	__dbus_object_path__ = property(lambda self: self._path)
+
+	def __del__(self):
+		path = self._path
+		if path is None:
+			return
+		self._path = None
+		if self._deletecallback is not None:
+			self._deletecallback(path)
+		logging.debug("VeDbusFallbackItem %s has been removed" % path)
+
+	def _get_path(self):
+		return self._path
+
+	def PropertiesChanged(self, changes):
+		self._export.send_properties_changed(self._path, changes)
+
 ## This class behaves like a regular reference to a class method (eg. self.foo), but keeps a weak reference
 ## to the object which method is to be called.
 ## Use this object to break circular references.
@@ -4,11 +4,11 @@ read -p "Install MS4840N Solarcharger on Venus OS at your own risk? [Y to procee
 echo    # (optional) move to a new line
 if [[ $REPLY =~ ^[Yy]$ ]]
 then
-	# we need python3-pip and minimalmodbus
-    echo "Download and install pip3 and minimalmodbus"
+	# we need python3-pip and pyserial
+    echo "Download and install pip3 and pyserial"
     opkg update
     opkg install python3-pip
-    pip3 install -U minimalmodbus
+    pip3 install -U pyserial
 
 
     echo "Download driver and library"